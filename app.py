@@ -1,7 +1,12 @@
 import streamlit as st
 import pandas as pd
 import database_manager as db
-import hashlib # For basic password hashing (for demo purposes)
+import hashlib # Only for verifying legacy SHA256 password hashes
+import hmac
+import threading
+import time
+import uuid
+import bcrypt # Salted password hashing
 from mysql.connector import Error
 from decimal import Decimal # For precise financial calculations
 import plotly.express as px # For visualizations
@@ -16,75 +21,394 @@ st.set_page_config(layout="wide", page_title="Wealth Management System")
 # --- Admin Credentials (for demo purposes - in a real app, manage securely) ---
 ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "admin_password" # This will be hashed and stored in DB
+MAX_ASSET_OPTIONS = 200 # Cap on assets listed/offered at once in the Buy Assets page
+BCRYPT_ROUNDS = 10 # bcrypt cost factor (2^rounds iterations)
+DASHBOARD_TTL = 300 # Seconds before a session's loaded data is re-read, to pick up other sessions' writes
 
 # --- Helper Functions ---
 def hash_password(password):
-    """Hashes a password using SHA256 for basic security (for demo)."""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hashes a password with a salted bcrypt hash, returned as a 60-character string."""
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
 
 def check_password(hashed_password, user_password):
-    """Checks if a given password matches the hashed password."""
-    return hashed_password == hashlib.sha256(user_password.encode()).hexdigest()
+    """Checks if a given password matches the stored hash.
+    Accounts registered before the bcrypt switch still hold an unsalted SHA256
+    hex digest, which is verified with a constant-time compare."""
+    if isinstance(hashed_password, bytes):
+        hashed_password = hashed_password.decode()
+    if hashed_password.startswith('$2'):
+        return bcrypt.checkpw(user_password.encode(), hashed_password.encode())
+    return hmac.compare_digest(hashed_password, hashlib.sha256(user_password.encode()).hexdigest())
+
+@st.cache_resource(show_spinner=False)
+def ensure_admin_user():
+    """Creates the admin user if it doesn't exist yet. Runs once per server process,
+    so the lookup and the bcrypt hash aren't repeated per session or rerun.
+    Returns a shared dict holding 'created': True if the admin was created by this call;
+    the first session to pop() the flag shows the notice, later sessions don't.
+    Errors are raised (and so not cached), letting a later session retry."""
+    if db.get_user_by_username(ADMIN_USERNAME):
+        return {}
+    if not db.add_user(ADMIN_USERNAME, hash_password(ADMIN_PASSWORD), 'admin@wealth.com', 'admin'):
+        raise RuntimeError("database unavailable")
+    return {'created': True}
+
+# --- Data Versions ---
+# st.cache_data entries are shared by every session in the process, so the versions in
+# their keys are kept server-side too: a write in one session bumps the version that all
+# other sessions of the same user (and the admin views) key their cached reads on.
+ALL_USERS_SCOPE = 'all_users' # The admin's system-wide tables
+PRICES_SCOPE = 'asset_prices' # Asset prices, which every user's investment values depend on
+
+@st.cache_resource(show_spinner=False)
+def _data_versions():
+    """Process-wide write counters: (lock, {scope: version}). A scope is a user_id
+    (that user's rows), ALL_USERS_SCOPE or PRICES_SCOPE."""
+    return threading.Lock(), {}
+
+def scope_version(scope):
+    """Current write counter of one scope."""
+    lock, versions = _data_versions()
+    with lock:
+        return versions.get(scope, 0)
+
+def bump_data_version(*scopes):
+    """Advances the write counters of the given scopes (None scopes are skipped)."""
+    lock, versions = _data_versions()
+    with lock:
+        for scope in scopes:
+            if scope is not None:
+                versions[scope] = versions.get(scope, 0) + 1
+
+def data_version(user_id=None):
+    """Version of everything a user's dashboard shows: (their own rows, asset prices).
+    Defaults to the logged-in user."""
+    if user_id is None:
+        user_id = st.session_state.user_id
+    return (scope_version(user_id), scope_version(PRICES_SCOPE))
+
+@st.cache_data(ttl=DASHBOARD_TTL, show_spinner=False)
+def _cached_dashboard(user_id, user_role, version):
+    """Cached wrapper around db.preload_dashboard.
+    `version` is data_version(user_id); it is only part of the cache key,
+    so a write from any session forces a fresh load.
+    The shared reference tables come from load_reference_frames instead."""
+    return db.preload_dashboard(user_id, user_role, include_reference=False)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_reference_frames():
+    """Cached asset_types/assets tables. These are the same for every user and only
+    change when an admin updates them, so they are shared across sessions and
+    invalidated with load_reference_frames.clear() rather than by data_version."""
+    return {
+        'asset_types_df': db.get_asset_types_df(),
+        'assets_df': db.get_assets_df(columns=db.ASSET_LIST_COLUMNS),
+    }
+
+def to_decimal(value):
+    """Returns value as a Decimal, only parsing it when it isn't one already."""
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+def index_rows_by(df, column):
+    """Builds a {value: row dict} lookup on `column`. The first row wins on duplicate values,
+    matching the previous df[df[column] == value].iloc[0] lookups."""
+    lookup = {}
+    if not df.empty:
+        for row in df.to_dict('records'):
+            lookup.setdefault(row[column], row)
+    return lookup
+
+# Session-state frames loaded for every logged-in user
+USER_FRAMES = ('accounts_df', 'portfolios_df', 'asset_types_df', 'assets_df', 'investments_df', 'transactions_df')
+
+# Primary keys, typed once as int64 so the row dicts from index_rows_by hold plain
+# Python ints that can go straight into DB calls (the driver rejects numpy scalars)
+ID_COLUMNS = {
+    'accounts_df': 'account_id',
+    'portfolios_df': 'portfolio_id',
+    'asset_types_df': 'asset_type_id',
+    'assets_df': 'asset_id',
+    'investments_df': 'investment_id',
+}
+
+# Money columns used in purchase math, typed as Decimal once per load
+DECIMAL_COLUMNS = {'assets_df': 'unit_price', 'accounts_df': 'current_balance'}
+
+# Name -> row lookups and selectbox name lists, built once per load so widget
+# handlers don't touch the DataFrames on every rerun: (lookup key, column, names key)
+NAME_LOOKUPS = {
+    'assets_df': ('assets_by_name', 'name', 'asset_names'),
+    'portfolios_df': ('portfolios_by_name', 'portfolio_name', 'portfolio_names'),
+    'asset_types_df': ('asset_types_by_name', 'type_name', 'asset_type_names'),
+    'accounts_df': ('accounts_by_name', 'account_name', 'account_names'),
+    'investments_df': ('investments_by_name', 'investment_name', 'investment_names'),
+}
+
+def store_session_data(key, value):
+    """Stores loaded data in session_state and registers the key in '_managed_keys',
+    so logout can clear exactly what was loaded without scanning every key."""
+    st.session_state[key] = value
+    st.session_state.setdefault('_managed_keys', set()).add(key)
+
+def clear_session_data():
+    """Removes every key registered by store_session_data()."""
+    for key in st.session_state.pop('_managed_keys', ()):
+        st.session_state.pop(key, None)
+
+def prepare_frame(df_key, df):
+    """Applies the one-time dtype coercions to a freshly loaded frame, then stores it
+    in session_state under df_key and rebuilds its name lookup. The frame is only
+    modified before it's stored, so views can treat session-state frames as read-only."""
+    if not df.empty:
+        if df_key in ID_COLUMNS:
+            df[ID_COLUMNS[df_key]] = df[ID_COLUMNS[df_key]].astype('int64')
+        if df_key in DECIMAL_COLUMNS:
+            df[DECIMAL_COLUMNS[df_key]] = df[DECIMAL_COLUMNS[df_key]].map(to_decimal)
+        # Numeric and datetime columns arrive typed (see db.INVESTMENT_DTYPES / TRANSACTION_DTYPES)
+        if df_key == 'investments_df':
+            # Plain date objects, ready for st.date_input in the update form
+            df['purchase_date'] = df['purchase_date'].dt.date
+    store_session_data(df_key, df)
+    # A fresh token per load, unique across sessions, for caches keyed on this frame's contents
+    store_session_data(f'{df_key}_token', uuid.uuid4().hex)
+    if df_key in NAME_LOOKUPS:
+        lookup_key, column, names_key = NAME_LOOKUPS[df_key]
+        store_session_data(lookup_key, index_rows_by(df, column))
+        store_session_data(names_key, df[column].tolist() if not df.empty else [])
+
+def frame_token(df_key):
+    """The load token prepare_frame() stored alongside the session frame df_key."""
+    return st.session_state.get(f'{df_key}_token')
 
 def load_data(user_id, user_role):
     """Loads all necessary data for the dashboard and management sections based on user role."""
-    # Initialize all relevant dataframes to empty DataFrames to prevent AttributeError
-    st.session_state['accounts_df'] = pd.DataFrame()
-    st.session_state['portfolios_df'] = pd.DataFrame()
-    st.session_state['asset_types_df'] = pd.DataFrame()
-    st.session_state['assets_df'] = pd.DataFrame()
-    st.session_state['investments_df'] = pd.DataFrame()
-    st.session_state['transactions_df'] = pd.DataFrame()
-    st.session_state['portfolio_summary'] = {'total_account_balance': Decimal('0.00'), 'total_investment_value': Decimal('0.00'), 'total_portfolio_value': Decimal('0.00')}
-    st.session_state['all_users_df'] = pd.DataFrame()
-    st.session_state['all_accounts_df'] = pd.DataFrame()
-    st.session_state['all_investments_df'] = pd.DataFrame()
-    st.session_state['all_transactions_df'] = pd.DataFrame()
-
-
-    # Load common data for all roles
-    st.session_state['accounts_df'] = db.get_account_balances_df(user_id)
-    st.session_state['portfolios_df'] = db.get_portfolios_df(user_id)
-    st.session_state['asset_types_df'] = db.get_asset_types_df()
-    st.session_state['assets_df'] = db.get_assets_df()
-
-    if user_role == 'admin':
-        st.session_state['all_users_df'] = pd.DataFrame(db.get_all_users())
-        st.session_state['all_accounts_df'] = db.get_account_balances_df(user_id=None)
-        st.session_state['all_investments_df'] = db.get_investments_df(user_id=None)
-        st.session_state['all_transactions_df'] = db.get_transactions_df(user_id=None)
-    else: # Regular user
-        st.session_state['investments_df'] = db.get_investments_df(user_id)
-        st.session_state['transactions_df'] = db.get_transactions_df(user_id)
-        st.session_state['portfolio_summary'] = db.get_portfolio_summary(user_id)
-
-def refresh_data():
-    """Refreshes all data after a modification."""
-    if 'user_id' in st.session_state and st.session_state.user_id and \
-       'user_role' in st.session_state and st.session_state.user_role:
-        load_data(st.session_state.user_id, st.session_state.user_role)
-    else:
-        st.warning("Please log in to refresh data.")
+    # Default every frame to an empty DataFrame to prevent AttributeError
+    data = {df_key: pd.DataFrame() for df_key in USER_FRAMES}
+    data['portfolio_summary'] = {'total_account_balance': Decimal('0.00'), 'total_investment_value': Decimal('0.00'), 'total_portfolio_value': Decimal('0.00')}
+    # Admin-only all_* DataFrames are loaded on demand by load_admin_section()/load_admin_page()
+
+    # Load common and role-specific data in a single DB round-trip
+    version = data_version(user_id)
+    result = _cached_dashboard(user_id, user_role, version)
+    if result:
+        data.update(result)
+    data.update(load_reference_frames())
+
+    # Each frame is prepared, then swapped into session_state whole
+    for df_key in USER_FRAMES:
+        prepare_frame(df_key, data[df_key])
+    store_session_data('portfolio_summary', data['portfolio_summary'])
+
+    st.session_state['loaded_version'] = version
+    st.session_state['loaded_at'] = time.monotonic()
+
+def data_is_stale():
+    """True if load_data() needs to run: nothing is loaded yet, a write (from any session)
+    bumped data_version since the last load, or the loaded data is older than DASHBOARD_TTL."""
+    return (
+        'investments_df' not in st.session_state or
+        st.session_state.get('loaded_version') != data_version() or
+        time.monotonic() - st.session_state.get('loaded_at', 0) > DASHBOARD_TTL
+    )
+
+# Columns the admin views display from the system-wide tables; only these are selected
+ADMIN_INVESTMENT_FIELDS = ('username', 'portfolio_name', 'investment_name', 'symbol', 'asset_name', 'asset_category_name', 'quantity', 'current_unit_price', 'current_value', 'currency')
+ADMIN_ACCOUNT_FIELDS = ('username', 'account_name', 'account_type', 'current_balance', 'currency', 'created_at')
+ADMIN_TRANSACTION_FIELDS = ('transaction_date', 'username', 'transaction_type', 'amount', 'quantity', 'asset_name', 'account_name', 'description')
+
+# Columns shown by the investment/transaction tables (subsets of the frames above and of the user frames)
+ADMIN_DASHBOARD_INVESTMENT_COLUMNS = ['username', 'portfolio_name', 'investment_name', 'asset_name', 'quantity', 'current_unit_price', 'current_value', 'currency']
+DASHBOARD_INVESTMENT_COLUMNS = ['investment_name', 'symbol', 'asset_name', 'asset_category_name', 'quantity', 'current_unit_price', 'current_value']
+USER_INVESTMENT_COLUMNS = DASHBOARD_INVESTMENT_COLUMNS + ['currency']
+USER_TRANSACTION_COLUMNS = ['transaction_date', 'transaction_type', 'amount', 'quantity', 'asset_name', 'account_name', 'description']
+
+# Loaders for the admin-only, system-wide tables. These scan every user's data,
+# so they are only run when the admin opens a section that displays them.
+ADMIN_SECTION_LOADERS = {
+    'all_users_df': db.get_all_users_df,
+    'all_accounts_df': lambda: db.get_account_balances_df(user_id=None, fields=ADMIN_ACCOUNT_FIELDS),
+}
+
+# The two largest admin tables are fetched one page at a time: (row counter, page loader)
+ADMIN_PAGE_SIZES = [50, 200, 1000]
+ADMIN_PAGED_LOADERS = {
+    'all_investments_df': (db.count_all_investments, lambda limit, offset: db.get_investments_df(user_id=None, fields=ADMIN_INVESTMENT_FIELDS, limit=limit, offset=offset)),
+    'all_transactions_df': (db.count_all_transactions, lambda limit, offset: db.get_transactions_df(user_id=None, fields=ADMIN_TRANSACTION_FIELDS, limit=limit, offset=offset)),
+}
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_admin_section(name, version):
+    """Cached wrapper around ADMIN_SECTION_LOADERS, keyed on the ALL_USERS_SCOPE version."""
+    return ADMIN_SECTION_LOADERS[name]()
+
+def load_admin_section(name):
+    """Loads one admin-only all_* DataFrame on demand and stores it in session_state."""
+    store_session_data(name, _cached_admin_section(name, scope_version(ALL_USERS_SCOPE)))
+    return st.session_state[name]
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_admin_count(name, version):
+    """Cached row count for a paged admin table, keyed like _cached_admin_section."""
+    return ADMIN_PAGED_LOADERS[name][0]()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_admin_page(name, page, page_size, version):
+    """Cached single page of a paged admin table."""
+    return ADMIN_PAGED_LOADERS[name][1](page_size, (page - 1) * page_size)
+
+def load_admin_page(name, key):
+    """Renders page controls for a paged admin table and loads only the selected page,
+    so session_state and the websocket carry at most one page of rows."""
+    version = scope_version(ALL_USERS_SCOPE)
+    total_rows = _cached_admin_count(name, version)
+    size_col, page_col = st.columns(2)
+    page_size = size_col.selectbox("Rows per page", ADMIN_PAGE_SIZES, key=f"{key}_page_size")
+    page_count = max(1, -(-total_rows // page_size)) # Ceiling division
+    # Keep the stored page in range when the page size grows or rows are deleted
+    if st.session_state.get(f"{key}_page", 1) > page_count:
+        st.session_state[f"{key}_page"] = page_count
+    page = page_col.number_input(f"Page (of {page_count}, {total_rows} rows)", min_value=1, max_value=page_count, step=1, key=f"{key}_page") # Defaults to min_value
+    store_session_data(name, _cached_admin_page(name, int(page), page_size, version))
+    return st.session_state[name]
+
+def refresh_data(*scopes):
+    """Marks cached data stale after a modification by the logged-in user.
+    Bumps the server-side versions of that user, of the admin tables and of any extra
+    `scopes` (another user's id, PRICES_SCOPE). Nothing is reloaded here; the load_data()
+    call at the top of the next script run does that, so calling this right before
+    st.rerun() doesn't load everything twice."""
+    user_id = st.session_state.get('user_id')
+    if user_id:
+        # Drop this user's now-stale cache entry instead of leaving it until the TTL expires
+        _cached_dashboard.clear(user_id, st.session_state.user_role, data_version(user_id))
+    bump_data_version(user_id, ALL_USERS_SCOPE, *scopes)
+
+# Single-frame reloaders used by the management fragments
+FRAME_LOADERS = {
+    'accounts_df': db.get_account_balances_df,
+    'portfolios_df': db.get_portfolios_df,
+    'investments_df': db.get_investments_df,
+    'transactions_df': db.get_transactions_df,
+}
+
+def refresh_frames(*df_keys):
+    """Reloads only the given user frames after a mutation inside a management fragment,
+    so a fragment-scoped rerun sees fresh data without reloading everything.
+    Also marks the cached data stale so the next full rerun doesn't serve it."""
+    refresh_data()
+    # The loaders only touch the database, so several frames are fetched in parallel
+    frames = db.run_concurrently([(FRAME_LOADERS[df_key], st.session_state.user_id) for df_key in df_keys])
+    for df_key, df in zip(df_keys, frames):
+        prepare_frame(df_key, df)
+
+def changed_rows(original_df, edited_df, id_column, columns):
+    """Diffs an st.data_editor result against the frame it was given.
+    Returns [(id, edited row dict)] for rows where any of `columns` changed."""
+    changes = []
+    for original, edited in zip(original_df.to_dict('records'), edited_df.to_dict('records')):
+        if any(original[c] != edited[c] and not (pd.isna(original[c]) and pd.isna(edited[c])) for c in columns):
+            changes.append((original[id_column], edited))
+    return changes
+
+# The chart caches below don't hash their frames (leading underscore); they are keyed on the
+# frame's load token instead, which changes whenever the frame is reloaded, including the
+# reload after DASHBOARD_TTL. Entries outlive their load by at most DASHBOARD_TTL.
+@st.cache_data(ttl=DASHBOARD_TTL, show_spinner=False)
+def prepare_investment_allocation(_investments_df, load_token):
+    """Sums current investment value per asset category for the allocation pie chart."""
+    # 'current_value' is already float64 (typed by the db frame builders)
+    # asset_category_name is categorical; observed=True keeps unused categories out of the pie
+    investment_by_category = _investments_df.groupby('asset_category_name', observed=True)['current_value'].sum().reset_index()
+    # Filter out categories with zero or NaN values if any after conversion
+    return investment_by_category[investment_by_category['current_value'].notna() & (investment_by_category['current_value'] > 0)]
+
+@st.cache_data(ttl=DASHBOARD_TTL, show_spinner=False)
+def prepare_transactions_chart(_transactions_df, load_token):
+    """Cleans transactions into ascending date order for the line chart, keyed like prepare_investment_allocation."""
+    # 'amount' and 'transaction_date' are already typed (by the db frame builders)
+    # Filter out rows with NaN amounts or invalid dates
+    transactions_df_copy = _transactions_df.dropna(subset=['amount', 'transaction_date'])
+    transactions_df_copy = transactions_df_copy[transactions_df_copy['amount'] > 0]
+
+    # Transactions arrive newest-first (ORDER BY transaction_date DESC in SQL),
+    # so reversing gives ascending time order without re-sorting
+    return transactions_df_copy.iloc[::-1]
+
+@st.cache_data(ttl=DASHBOARD_TTL, show_spinner=False)
+def make_allocation_pie(_investment_by_category, load_token):
+    """Builds the allocation donut chart once per load of the investments frame."""
+    fig_pie = px.pie(
+        _investment_by_category,
+        values='current_value',
+        names='asset_category_name',
+        title='Your Investment Allocation by Category',
+        hole=0.3 # Creates a donut chart
+    )
+    fig_pie.update_traces(textposition='inside', textinfo='percent+label')
+    return fig_pie
+
+@st.cache_data(ttl=DASHBOARD_TTL, show_spinner=False)
+def make_transactions_line(_transactions_chart_df, load_token):
+    """Builds the transactions line chart (with range selector/slider) once per load of the transactions frame."""
+    fig_line = px.line(
+        _transactions_chart_df,
+        x='transaction_date',
+        y='amount',
+        color='transaction_type', # Differentiate lines by transaction type
+        title='Transactions Amount Over Time',
+        labels={'transaction_date': 'Date', 'amount': 'Amount ($)', 'transaction_type': 'Transaction Type'}
+    )
+    fig_line.update_xaxes(
+        rangeselector=dict(
+            buttons=list([
+                dict(count=1, label="1m", step="month", stepmode="backward"),
+                dict(count=6, label="6m", step="month", stepmode="backward"),
+                dict(count=1, label="YTD", step="year", stepmode="todate"),
+                dict(count=1, label="1y", step="year", stepmode="backward"),
+                dict(step="all")
+            ])
+        ),
+        rangeslider=dict(visible=True),
+        type="date"
+    )
+    return fig_line
+
+@st.cache_data(ttl=DASHBOARD_TTL, show_spinner=False)
+def make_transaction_labels(_transactions_df, load_token):
+    """Builds the Delete Transaction labels with vectorized string ops, once per load of the
+    transactions frame, so the ids always match the frame on screen.
+    Returns (labels, transaction_ids) as parallel lists."""
+    descriptions = _transactions_df['description'].fillna('').replace('', 'No description')
+    labels = (
+        _transactions_df['transaction_date'].dt.strftime('%Y-%m-%d %H:%M') + ' - ' +
+        _transactions_df['transaction_type'].astype(str) + ' ' + # Categorical; concatenation needs plain strings
+        _transactions_df['amount'].map('{:.2f}'.format) + ' (' + descriptions + ')'
+    )
+    return labels.tolist(), _transactions_df['transaction_id'].tolist()
 
 # --- Authentication Section ---
 def show_auth_section():
     st.sidebar.title("Authentication")
-    auth_choice = st.sidebar.radio("Choose an option", ["Login", "Register"], key="auth_choice_radio")
+    # Deselecting the segmented control returns None, which falls back to Login
+    auth_choice = st.sidebar.segmented_control("Choose an option", ["Login", "Register"], default="Login", key="auth_choice_radio") or "Login"
 
     if auth_choice == "Login":
         st.sidebar.subheader("Login")
         username = st.sidebar.text_input("Username", key="login_username_input")
         password = st.sidebar.text_input("Password", type="password", key="login_password_input")
         if st.sidebar.button("Login", key="login_button"):
-            user_data = db.get_user_by_username(username)
-            if user_data:
-                user = user_data[0]
+            try:
+                user = db.get_user_by_username(username)
+            except Error as e:
+                st.sidebar.error(f"Could not log in right now: Database error - {e}")
+                st.stop()
+            if user:
                 if check_password(user['password'], password):
                     st.session_state.logged_in = True
                     st.session_state.user_id = user['user_id']
                     st.session_state.username = user['username']
                     st.session_state.user_role = user['role'] # Store user role
-                    refresh_data() # Load data on successful login
+                    bump_data_version(user['user_id']) # Make sure the first load after login is fresh
                     st.sidebar.success(f"Welcome, {st.session_state.username} ({st.session_state.user_role})!")
                     st.rerun()
                 else:
@@ -93,14 +417,17 @@ def show_auth_section():
                 st.sidebar.error("Username not found.")
     else: # Register
         st.sidebar.subheader("Register")
-        new_username = st.sidebar.text_input("New Username", key="reg_username_input")
-        new_password = st.sidebar.text_input("New Password", type="password", key="reg_password_input")
-        new_email = st.sidebar.text_input("Email (Optional)", key="reg_email_input")
+        # A form keeps typing in these fields from rerunning the app; only submit does
+        with st.sidebar.form("register_form"):
+            new_username = st.text_input("New Username", key="reg_username_input")
+            new_password = st.text_input("New Password", type="password", key="reg_password_input")
+            new_email = st.text_input("Email (Optional)", key="reg_email_input")
+            register_submitted = st.form_submit_button("Register")
         
         # Default role for new registrations is 'user'
         # Admin registration is handled by pre-populating DB or a separate admin-only registration
         
-        if st.sidebar.button("Register", key="register_button"):
+        if register_submitted:
             if new_username and new_password:
                 email_to_db = new_email if new_email.strip() != '' else None
                 hashed_pass = hash_password(new_password)
@@ -124,11 +451,8 @@ def show_auth_section():
                 st.warning("Username and Password are required.")
 
 # --- Dashboard Section (User) ---
-def show_dashboard():
-    st.title(f"📊 Dashboard for {st.session_state.username}")
-
-    summary = st.session_state.portfolio_summary
-
+@st.fragment
+def _metrics_fragment(summary):
     col1, col2, col3 = st.columns(3)
     with col1:
         st.metric("Total Account Balance", f"${summary['total_account_balance']:.2f}")
@@ -137,160 +461,169 @@ def show_dashboard():
     with col3:
         st.metric("Total Portfolio Value", f"${summary['total_portfolio_value']:.2f}")
 
+@st.fragment
+def _portfolios_fragment(portfolios_df):
     st.subheader("Your Portfolios")
-    if not st.session_state.portfolios_df.empty:
-        st.dataframe(st.session_state.portfolios_df[['portfolio_name', 'description', 'creation_date']], use_container_width=True)
+    if not portfolios_df.empty:
+        st.dataframe(portfolios_df[['portfolio_name', 'description', 'creation_date']], use_container_width=True)
     else:
         st.info("No portfolios added yet. Go to 'Manage Portfolios' to add one.")
 
+@st.fragment
+def _accounts_fragment(accounts_df):
     st.subheader("Account Balances")
-    if not st.session_state.accounts_df.empty:
-        st.dataframe(st.session_state.accounts_df[['account_name', 'account_type', 'current_balance', 'currency']], use_container_width=True)
+    if not accounts_df.empty:
+        st.dataframe(accounts_df[['account_name', 'account_type', 'current_balance', 'currency']], use_container_width=True)
     else:
         st.info("No accounts added yet. Go to 'Manage Accounts' to add one.")
 
+@st.fragment
+def _investments_overview_fragment(investments_df):
     st.subheader("Your Investments Overview")
-    if not st.session_state.investments_df.empty:
+    if not investments_df.empty:
         # Display dynamically calculated current_value
-        st.dataframe(st.session_state.investments_df[['investment_name', 'symbol', 'asset_name', 'asset_category_name', 'quantity', 'current_unit_price', 'current_value']], use_container_width=True)
+        st.dataframe(investments_df[DASHBOARD_INVESTMENT_COLUMNS], use_container_width=True)
     else:
         st.info("No investments added yet. Go to 'Manage Investments' or 'Buy Assets' to add one.")
 
-    # Visualizations for User Dashboard
-    st.subheader("Investment & Transaction Insights")
-    vis_col1, vis_col2 = st.columns(2)
+@st.fragment
+def _allocation_pie_fragment(investments_df):
+    st.markdown("#### Investment Allocation by Category")
+    if not investments_df.empty:
+        investment_by_category = prepare_investment_allocation(investments_df, frame_token('investments_df'))
 
-    with vis_col1:
-        st.markdown("#### Investment Allocation by Category")
-        if not st.session_state.investments_df.empty:
-            # Ensure 'current_value' is numeric for summing
-            st.session_state.investments_df['current_value'] = pd.to_numeric(st.session_state.investments_df['current_value'], errors='coerce')
-            investment_by_category = st.session_state.investments_df.groupby('asset_category_name')['current_value'].sum().reset_index()
-            # Filter out categories with zero or NaN values if any after conversion
-            investment_by_category = investment_by_category[investment_by_category['current_value'].notna() & (investment_by_category['current_value'] > 0)]
-
-            if not investment_by_category.empty:
-                fig_pie = px.pie(
-                    investment_by_category,
-                    values='current_value',
-                    names='asset_category_name',
-                    title='Your Investment Allocation by Category',
-                    hole=0.3 # Creates a donut chart
-                )
-                fig_pie.update_traces(textposition='inside', textinfo='percent+label')
-                st.plotly_chart(fig_pie, use_container_width=True)
-            else:
-                st.info("No investments with a value to display in the pie chart yet.")
+        if not investment_by_category.empty:
+            fig_pie = make_allocation_pie(investment_by_category, frame_token('investments_df'))
+            st.plotly_chart(fig_pie, use_container_width=True)
         else:
-            st.info("No investments to display in the pie chart yet.")
+            st.info("No investments with a value to display in the pie chart yet.")
+    else:
+        st.info("No investments to display in the pie chart yet.")
 
-    with vis_col2:
-        st.markdown("#### Transactions Over Time")
-        if not st.session_state.transactions_df.empty:
-            # Ensure 'amount' is numeric and 'transaction_date' is datetime
-            transactions_df_copy = st.session_state.transactions_df.copy()
-            transactions_df_copy['amount'] = pd.to_numeric(transactions_df_copy['amount'], errors='coerce')
-            transactions_df_copy['transaction_date'] = pd.to_datetime(transactions_df_copy['transaction_date'])
-
-            # Filter out rows with NaN amounts or invalid dates
-            transactions_df_copy = transactions_df_copy.dropna(subset=['amount', 'transaction_date'])
-            transactions_df_copy = transactions_df_copy[transactions_df_copy['amount'] > 0]
-
-            if not transactions_df_copy.empty:
-                # Sort by date for proper time series visualization
-                transactions_df_copy = transactions_df_copy.sort_values(by='transaction_date')
-
-                fig_line = px.line(
-                    transactions_df_copy,
-                    x='transaction_date',
-                    y='amount',
-                    color='transaction_type', # Differentiate lines by transaction type
-                    title='Transactions Amount Over Time',
-                    labels={'transaction_date': 'Date', 'amount': 'Amount ($)', 'transaction_type': 'Transaction Type'}
-                )
-                fig_line.update_xaxes(
-                    rangeselector=dict(
-                        buttons=list([
-                            dict(count=1, label="1m", step="month", stepmode="backward"),
-                            dict(count=6, label="6m", step="month", stepmode="backward"),
-                            dict(count=1, label="YTD", step="year", stepmode="todate"),
-                            dict(count=1, label="1y", step="year", stepmode="backward"),
-                            dict(step="all")
-                        ])
-                    ),
-                    rangeslider=dict(visible=True),
-                    type="date"
-                )
-                st.plotly_chart(fig_line, use_container_width=True)
-            else:
-                st.info("No transactions with valid amounts and dates to display in the chart yet.")
-        else:
-            st.info("No transactions to display in the chart yet.")
+@st.fragment
+def _transactions_line_fragment(transactions_df):
+    st.markdown("#### Transactions Over Time")
+    if not transactions_df.empty:
+        transactions_df_copy = prepare_transactions_chart(transactions_df, frame_token('transactions_df'))
 
+        if not transactions_df_copy.empty:
+            fig_line = make_transactions_line(transactions_df_copy, frame_token('transactions_df'))
+            st.plotly_chart(fig_line, use_container_width=True)
+        else:
+            st.info("No transactions with valid amounts and dates to display in the chart yet.")
+    else:
+        st.info("No transactions to display in the chart yet.")
 
+@st.fragment
+def _recent_tx_fragment(transactions_df):
     st.subheader("Recent Transactions")
-    if not st.session_state.transactions_df.empty:
-        st.dataframe(st.session_state.transactions_df[['transaction_date', 'transaction_type', 'amount', 'quantity', 'asset_name', 'account_name', 'description']].head(10), use_container_width=True)
+    if not transactions_df.empty:
+        st.dataframe(transactions_df[USER_TRANSACTION_COLUMNS].head(10), use_container_width=True)
     else:
         st.info("No transactions recorded yet. Add one in 'Manage Transactions' or 'Buy Assets'.")
 
+def show_dashboard():
+    st.title(f"📊 Dashboard for {st.session_state.username}")
+
+    # Each section is its own fragment, so interactions inside one panel
+    # (e.g. the line chart's range selector) only rerun that panel.
+    _metrics_fragment(st.session_state.portfolio_summary)
+    _portfolios_fragment(st.session_state.portfolios_df)
+    _accounts_fragment(st.session_state.accounts_df)
+    _investments_overview_fragment(st.session_state.investments_df)
+
+    # Visualizations for User Dashboard
+    st.subheader("Investment & Transaction Insights")
+    vis_col1, vis_col2 = st.columns(2)
+
+    with vis_col1:
+        _allocation_pie_fragment(st.session_state.investments_df)
+
+    with vis_col2:
+        _transactions_line_fragment(st.session_state.transactions_df)
+
+    _recent_tx_fragment(st.session_state.transactions_df)
+
 # --- Admin Dashboard Section ---
+@st.fragment
+def admin_table_fragment(name, key, label, toggle_key, columns, empty_message):
+    """One paged admin table behind a toggle. Nothing is queried until the toggle is on,
+    and flipping it or paging only reruns this fragment."""
+    if st.toggle(label, key=toggle_key):
+        df = load_admin_page(name, key)
+        if not df.empty:
+            st.dataframe(df[list(columns)], use_container_width=True)
+        else:
+            st.info(empty_message)
+
 def show_admin_dashboard():
     st.title("👑 Admin Dashboard")
 
+    # The system-wide tables are only queried once the admin asks to see them
     st.subheader("All Registered Users")
-    if not st.session_state.all_users_df.empty:
-        st.dataframe(st.session_state.all_users_df, use_container_width=True)
-    else:
-        st.info("No users registered yet.")
+    if st.toggle("Show all registered users", key="admin_show_all_users"):
+        all_users_df = load_admin_section('all_users_df')
+        if not all_users_df.empty:
+            st.dataframe(all_users_df, use_container_width=True)
+        else:
+            st.info("No users registered yet.")
 
     st.subheader("All Account Balances")
-    if not st.session_state.all_accounts_df.empty:
-        st.dataframe(st.session_state.all_accounts_df, use_container_width=True)
-    else:
-        st.info("No accounts found.")
+    if st.toggle("Show all account balances", key="admin_show_all_accounts"):
+        all_accounts_df = load_admin_section('all_accounts_df')
+        if not all_accounts_df.empty:
+            st.dataframe(all_accounts_df, use_container_width=True)
+        else:
+            st.info("No accounts found.")
 
     st.subheader("All Investments (User Portfolios)")
-    if not st.session_state.all_investments_df.empty:
-        st.dataframe(st.session_state.all_investments_df[['username', 'portfolio_name', 'investment_name', 'asset_name', 'quantity', 'current_unit_price', 'current_value', 'currency']], use_container_width=True)
-    else:
-        st.info("No investments found across all users.")
+    admin_table_fragment(
+        'all_investments_df', 'admin_dashboard_investments', "Show all investments", "admin_show_all_investments",
+        ADMIN_DASHBOARD_INVESTMENT_COLUMNS,
+        "No investments found across all users."
+    )
 
     st.subheader("Full Transaction History")
-    if not st.session_state.all_transactions_df.empty:
-        st.dataframe(st.session_state.all_transactions_df[['transaction_date', 'username', 'transaction_type', 'amount', 'quantity', 'asset_name', 'account_name', 'description']], use_container_width=True)
-    else:
-        st.info("No transactions recorded yet.")
+    admin_table_fragment(
+        'all_transactions_df', 'admin_dashboard_transactions', "Show full transaction history", "admin_show_all_transactions",
+        ADMIN_TRANSACTION_FIELDS,
+        "No transactions recorded yet."
+    )
 
     st.subheader("Manage Asset Prices")
     if not st.session_state.assets_df.empty:
         current_assets_df = st.session_state.assets_df
         st.dataframe(current_assets_df, use_container_width=True)
 
-        asset_names = current_assets_df['name'].tolist()
+        asset_names = st.session_state.asset_names
         selected_asset_name = st.selectbox("Select Asset to Update Price", asset_names, key="admin_asset_price_select")
 
         if selected_asset_name:
-            selected_asset = current_assets_df[current_assets_df['name'] == selected_asset_name].iloc[0]
-            asset_id_to_update = int(selected_asset['asset_id'])
+            selected_asset = st.session_state.assets_by_name[selected_asset_name]
+            asset_id_to_update = selected_asset['asset_id']
             current_price = float(selected_asset['unit_price'])
 
-            new_price = st.number_input(
-                f"New Unit Price for {selected_asset_name} ({selected_asset['unit_type']})",
-                value=current_price,
-                min_value=0.01, # Prices should be positive
-                format="%.4f",
-                key="admin_new_asset_price_input"
-            )
+            # The asset selectbox stays outside the form so the price default follows it;
+            # typing in the price input doesn't rerun the app until submit.
+            with st.form("update_price_form"):
+                new_price = st.number_input(
+                    f"New Unit Price for {selected_asset_name} ({selected_asset['unit_type']})",
+                    value=current_price,
+                    min_value=0.01, # Prices should be positive
+                    format="%.4f",
+                    key="admin_new_asset_price_input"
+                )
+                price_submitted = st.form_submit_button(f"Update Price for {selected_asset_name}")
 
-            if st.button(f"Update Price for {selected_asset_name}", key="admin_update_asset_price_button"):
+            if price_submitted:
                 if new_price <= 0:
                     st.error("Asset price must be a positive value.")
                 else:
                     try:
                         if db.update_asset_price(asset_id_to_update, Decimal(str(new_price))):
                             st.success(f"Price of '{selected_asset_name}' updated to ${new_price:.4f}!")
-                            refresh_data() # Refresh all data to reflect new values
+                            load_reference_frames.clear() # Asset prices are shared reference data
+                            refresh_data(PRICES_SCOPE) # Every user's investment values moved; reloaded by the rerun below
                             st.rerun() # Force rerun to update all displayed values
                         else:
                             st.error("Failed to update asset price. Database operation failed.")
@@ -300,6 +633,7 @@ def show_admin_dashboard():
         st.info("No pre-defined assets found. Add some to the 'assets' table in your database.")
 
     st.subheader("Delete User")
+    load_admin_section('all_users_df')
     if not st.session_state.all_users_df.empty:
         # Filter out the current admin user from the deletion list
         users_to_delete_df = st.session_state.all_users_df[
@@ -308,23 +642,34 @@ def show_admin_dashboard():
         ]
         
         if not users_to_delete_df.empty:
-            user_display_names = [f"{row['username']} (ID: {row['user_id']})" for index, row in users_to_delete_df.iterrows()]
-            selected_user_display = st.selectbox("Select User to Delete", user_display_names, key="admin_delete_user_select")
+            # Build display labels with vectorized string ops and keep a positional
+            # user_id list alongside them instead of re-parsing the label later
+            user_display_names = (users_to_delete_df['username'] + ' (ID: ' + users_to_delete_df['user_id'].astype(str) + ')').tolist()
+            user_ids = users_to_delete_df['user_id'].tolist()
+            usernames = users_to_delete_df['username'].tolist()
+            selected_user_index = st.selectbox(
+                "Select User to Delete",
+                range(len(user_ids)),
+                format_func=user_display_names.__getitem__,
+                key="admin_delete_user_select"
+            )
 
-            if selected_user_display:
-                # Extract user_id from the display string
-                selected_user_id_str = selected_user_display.split('(ID: ')[1][:-1]
-                user_id_to_delete = int(selected_user_id_str)
-                selected_username = selected_user_display.split(' (ID:')[0]
+            if selected_user_index is not None:
+                user_id_to_delete = user_ids[selected_user_index]
+                selected_username = usernames[selected_user_index]
 
                 st.warning(f"WARNING: Deleting user '{selected_username}' will permanently remove ALL their associated data (accounts, portfolios, investments, transactions). This action cannot be undone.")
-                confirm_delete = st.checkbox(f"I understand and want to permanently delete user '{selected_username}'", key="confirm_user_delete_checkbox")
+                with st.form("delete_user_form"):
+                    confirm_delete = st.checkbox(f"I understand and want to permanently delete user '{selected_username}'", key="confirm_user_delete_checkbox")
+                    delete_submitted = st.form_submit_button(f"Confirm Delete User '{selected_username}'")
 
-                if confirm_delete and st.button(f"Confirm Delete User '{selected_username}'", key="admin_confirm_delete_user_button"):
+                if delete_submitted and not confirm_delete:
+                    st.warning("Please tick the confirmation box to delete this user.")
+                elif delete_submitted:
                     try:
                         if db.delete_user_and_all_data(user_id_to_delete):
                             st.success(f"User '{selected_username}' and all their data successfully deleted!")
-                            refresh_data() # Refresh all data for admin dashboard
+                            refresh_data(user_id_to_delete) # Reloaded by the rerun below
                             st.rerun()
                         else:
                             st.error(f"Failed to delete user '{selected_username}'. No records were affected.")
@@ -343,12 +688,23 @@ def buy_assets():
     st.title("🛒 Buy Assets")
 
     st.subheader("Available Assets")
-    if not st.session_state.assets_df.empty:
-        st.dataframe(st.session_state.assets_df, use_container_width=True)
-    else:
+    if st.session_state.assets_df.empty:
         st.warning("No assets available for purchase. Please contact admin.")
         return
 
+    # Only send a filtered, capped slice of the catalog to the browser
+    asset_filter = st.text_input("Search Assets", placeholder="Filter by name", key="buy_asset_filter")
+    matching_assets_df = st.session_state.assets_df
+    if asset_filter:
+        matching_assets_df = matching_assets_df[matching_assets_df['name'].str.contains(asset_filter, case=False, regex=False)]
+    if len(matching_assets_df) > MAX_ASSET_OPTIONS:
+        st.caption(f"Showing the first {MAX_ASSET_OPTIONS} of {len(matching_assets_df)} matching assets. Refine the search to narrow the list.")
+        matching_assets_df = matching_assets_df.head(MAX_ASSET_OPTIONS)
+    if matching_assets_df.empty:
+        st.info("No assets match your search.")
+        return
+    st.dataframe(matching_assets_df, use_container_width=True)
+
     st.subheader("Your Accounts (for payment)")
     if not st.session_state.accounts_df.empty:
         st.dataframe(st.session_state.accounts_df[['account_name', 'current_balance', 'currency']], use_container_width=True)
@@ -360,29 +716,29 @@ def buy_assets():
         # Select Account for payment
         account_options = ["None"]
         if not st.session_state.accounts_df.empty:
-            account_options = ["None"] + st.session_state.accounts_df['account_name'].tolist()
+            account_options = ["None"] + st.session_state.account_names
 
         selected_account_name = st.selectbox("Select Account for Payment", account_options, key="buy_asset_account_select")
         selected_account_id = None
         current_account_balance = Decimal('0.00')
         if selected_account_name != "None":
-            selected_account_row = st.session_state.accounts_df[st.session_state.accounts_df['account_name'] == selected_account_name].iloc[0]
-            selected_account_id = int(selected_account_row['account_id'])
-            current_account_balance = Decimal(str(selected_account_row['current_balance']))
+            selected_account_row = st.session_state.accounts_by_name[selected_account_name]
+            selected_account_id = selected_account_row['account_id']
+            current_account_balance = selected_account_row['current_balance'] # Already Decimal (see load_data)
             st.info(f"Selected Account Balance: ${current_account_balance:.2f}")
         else:
             st.warning("Please select an account.")
 
         # Select Asset to buy
-        asset_options = st.session_state.assets_df['name'].tolist()
+        asset_options = matching_assets_df['name'].tolist()
         selected_asset_name = st.selectbox("Select Asset to Buy", asset_options, key="buy_asset_select")
         selected_asset_id = None
         selected_asset_unit_price = Decimal('0.00')
         selected_asset_unit_type = ""
         if selected_asset_name:
-            selected_asset_row = st.session_state.assets_df[st.session_state.assets_df['name'] == selected_asset_name].iloc[0]
-            selected_asset_id = int(selected_asset_row['asset_id'])
-            selected_asset_unit_price = Decimal(str(selected_asset_row['unit_price']))
+            selected_asset_row = st.session_state.assets_by_name[selected_asset_name]
+            selected_asset_id = selected_asset_row['asset_id']
+            selected_asset_unit_price = selected_asset_row['unit_price'] # Already Decimal (see load_data)
             selected_asset_unit_type = selected_asset_row['unit_type']
             st.info(f"Unit Price: ${selected_asset_unit_price:.4f} per {selected_asset_unit_type}")
         else:
@@ -395,8 +751,9 @@ def buy_assets():
             key="buy_asset_quantity_input"
         )
 
-        # Convert quantity_to_buy to Decimal before multiplication
-        total_cost = Decimal(str(quantity_to_buy)) * selected_asset_unit_price
+        # Convert quantity_to_buy to Decimal once and reuse it below
+        quantity_decimal = Decimal(repr(quantity_to_buy))
+        total_cost = quantity_decimal * selected_asset_unit_price
         st.info(f"Calculated Total Cost: ${total_cost:.2f}")
 
         submitted = st.form_submit_button("Confirm Purchase")
@@ -416,78 +773,73 @@ def buy_assets():
                 return
 
             try:
-                # 1. Deduct total from account
+                # 1. Work out the new account balance
                 new_account_balance = current_account_balance - total_cost
-                if not db.update_account_balance(selected_account_id, new_account_balance):
-                    raise Exception("Failed to update account balance.")
 
                 # 2. Update/Add quantity to user's investment portfolio
                 # Check if user already holds this asset in any portfolio
-                user_investments = db.get_investments_by_user(st.session_state.user_id)
-                existing_investment = next((inv for inv in user_investments if inv['asset_id'] == selected_asset_id), None)
+                existing_investment = db.get_investment_by_user_and_asset(st.session_state.user_id, selected_asset_id)
 
                 if existing_investment:
                     # Update existing investment quantity
-                    new_quantity = Decimal(str(existing_investment['quantity'])) + Decimal(str(quantity_to_buy))
-                    if not db.update_investment(existing_investment['investment_id'], quantity=new_quantity):
-                        raise Exception("Failed to update existing investment quantity.")
-                    st.success(f"Updated holdings of '{selected_asset_name}' in your portfolio.")
+                    new_quantity = to_decimal(existing_investment['quantity']) + quantity_decimal
+                    investment = {'investment_id': existing_investment['investment_id'], 'quantity': new_quantity}
                 else:
                     # Add new investment (requires selecting a portfolio and asset_category)
                     st.warning("You don't have this asset in any portfolio yet. Please select a portfolio and asset category for the new investment.")
                     
                     # Provide options to add to an existing portfolio or create a new one
-                    portfolio_options = st.session_state.portfolios_df['portfolio_name'].tolist() if not st.session_state.portfolios_df.empty else []
+                    portfolio_options = st.session_state.portfolio_names
                     new_investment_portfolio_name = st.selectbox("Select Portfolio for New Investment", portfolio_options, key="new_inv_portfolio_select")
 
-                    asset_category_options = st.session_state.asset_types_df['type_name'].tolist() if not st.session_state.asset_types_df.empty else []
+                    asset_category_options = st.session_state.asset_type_names
                     new_investment_asset_category_name = st.selectbox("Select Asset Category for New Investment", asset_category_options, key="new_inv_asset_category_select")
 
                     if new_investment_portfolio_name and new_investment_asset_category_name:
-                        new_portfolio_id = int(st.session_state.portfolios_df[st.session_state.portfolios_df['portfolio_name'] == new_investment_portfolio_name].iloc[0]['portfolio_id'])
-                        new_asset_category_id = int(st.session_state.asset_types_df[st.session_state.asset_types_df['type_name'] == new_investment_asset_category_name].iloc[0]['asset_type_id'])
-
-                        # Use the asset's name as investment name, or prompt for a custom one
-                        investment_name_for_new = f"{selected_asset_name} Holdings"
-                        symbol_for_new = selected_asset_row['symbol'] if 'symbol' in selected_asset_row else None # Assets table might not have symbol
-                        
-                        new_investment_id = db.add_investment(
-                            st.session_state.user_id,
-                            new_portfolio_id,
-                            new_asset_category_id,
-                            selected_asset_id,
-                            investment_name_for_new,
-                            symbol_for_new,
-                            total_cost, # Initial investment amount is the total cost of this first purchase
-                            pd.to_datetime('today').date(), # Purchase date
-                            Decimal(str(quantity_to_buy)), # Ensure quantity is Decimal here
-                            selected_account_row['currency'],
-                            f"Initial purchase of {selected_asset_name}"
-                        )
-                        if not new_investment_id:
-                            raise Exception("Failed to add new investment.")
-                        st.success(f"Added '{selected_asset_name}' as a new investment to your portfolio.")
+                        new_portfolio_id = st.session_state.portfolios_by_name[new_investment_portfolio_name]['portfolio_id']
+                        new_asset_category_id = st.session_state.asset_types_by_name[new_investment_asset_category_name]['asset_type_id']
+
+                        # The asset list only carries the display columns; fetch the full row for the symbol
+                        full_asset_row = db.get_asset_by_id(selected_asset_id) or {}
+
+                        investment = {
+                            'portfolio_id': new_portfolio_id,
+                            'asset_category_id': new_asset_category_id,
+                            'asset_id': selected_asset_id,
+                            'investment_name': f"{selected_asset_name} Holdings", # Use the asset's name as investment name
+                            'symbol': full_asset_row.get('symbol'), # Assets table might not have symbol
+                            'initial_investment_amount': total_cost, # Initial investment amount is the total cost of this first purchase
+                            'purchase_date': pd.to_datetime('today').date(),
+                            'quantity': quantity_decimal,
+                            'currency': selected_account_row['currency'],
+                            'notes': f"Initial purchase of {selected_asset_name}"
+                        }
                     else:
                         st.error("Please select a portfolio and asset category to add this new investment.")
                         return # Stop execution if not selected
 
-                # 3. Log transaction
-                transaction_description = f"Bought {quantity_to_buy:.4f} {selected_asset_unit_type} of {selected_asset_name}"
-                transaction_id = db.add_transaction(
-                    st.session_state.user_id,
-                    account_id=selected_account_id,
-                    asset_id=selected_asset_id,
-                    transaction_type='Buy',
-                    amount=total_cost,
-                    quantity=Decimal(str(quantity_to_buy)), # Ensure quantity is Decimal for transaction log
-                    unit_price_at_transaction=selected_asset_unit_price,
-                    description=transaction_description
-                )
+                # 3. Transaction log entry
+                transaction = {
+                    'account_id': selected_account_id,
+                    'asset_id': selected_asset_id,
+                    'transaction_type': 'Buy',
+                    'amount': total_cost,
+                    'quantity': quantity_decimal,
+                    'unit_price_at_transaction': selected_asset_unit_price,
+                    'description': f"Bought {quantity_to_buy:.4f} {selected_asset_unit_type} of {selected_asset_name}"
+                }
+
+                # Debit, holding update/insert and transaction log are committed together
+                transaction_id = db.execute_purchase(st.session_state.user_id, selected_account_id, new_account_balance, investment, transaction)
                 if not transaction_id:
-                    raise Exception("Failed to log transaction.")
+                    raise Exception("Failed to record the purchase.")
 
+                if existing_investment:
+                    st.success(f"Updated holdings of '{selected_asset_name}' in your portfolio.")
+                else:
+                    st.success(f"Added '{selected_asset_name}' as a new investment to your portfolio.")
                 st.success(f"Successfully purchased {quantity_to_buy:.4f} {selected_asset_unit_type} of {selected_asset_name} for ${total_cost:.2f}!")
-                refresh_data() # Refresh all data after successful transaction
+                refresh_data() # Reloaded by the rerun below
                 st.rerun() # Force rerun to update dashboard and forms
             except Error as e:
                 st.error(f"Transaction failed due to a database error: {e}")
@@ -496,6 +848,7 @@ def buy_assets():
 
 
 # --- Portfolio Management Section ---
+@st.fragment
 def manage_portfolios():
     st.title("💼 Manage Portfolios")
 
@@ -516,9 +869,10 @@ def manage_portfolios():
                     portfolio_id = db.add_portfolio(st.session_state.user_id, portfolio_name, description)
                     if portfolio_id:
                         st.success(f"Portfolio '{portfolio_name}' added successfully!")
-                        refresh_data()
-                        st.session_state['last_selected_portfolio_name'] = portfolio_name
-                        st.rerun()
+                        refresh_frames('portfolios_df')
+                        # Preselect the new portfolio; the selectbox below isn't drawn yet this run
+                        st.session_state['delete_portfolio_select'] = portfolio_name
+                        st.rerun(scope="fragment")
                     else:
                         st.error("Failed to add portfolio. This might be due to a database error or no rows affected.")
                 except Error as e:
@@ -529,78 +883,58 @@ def manage_portfolios():
             else:
                 st.warning("Portfolio Name is required.")
 
-    st.subheader("Update Portfolio")
+    st.subheader("Update Portfolios")
     if not st.session_state.portfolios_df.empty:
-        portfolio_names = st.session_state.portfolios_df['portfolio_name'].tolist()
-        default_update_index = 0
-        if 'last_selected_portfolio_name' in st.session_state and st.session_state['last_selected_portfolio_name'] in portfolio_names:
-            default_update_index = portfolio_names.index(st.session_state['last_selected_portfolio_name'])
-        
-        portfolio_to_update = st.selectbox(
-            "Select Portfolio to Update",
-            portfolio_names,
-            index=default_update_index,
-            key="update_portfolio_select"
+        original_portfolios = st.session_state.portfolios_df[['portfolio_id', 'portfolio_name', 'description']]
+        # Keyed on data_version so pending edits are dropped once fresh data is loaded
+        edited_portfolios = st.data_editor(
+            original_portfolios,
+            num_rows="fixed",
+            disabled=['portfolio_id'],
+            hide_index=True,
+            use_container_width=True,
+            key=f"portfolio_editor_{data_version()}"
         )
-        
-        if portfolio_to_update:
-            selected_portfolio_row = st.session_state.portfolios_df[st.session_state.portfolios_df['portfolio_name'] == portfolio_to_update].iloc[0]
-            portfolio_id_to_update = int(selected_portfolio_row['portfolio_id'])
-            original_portfolio_name = selected_portfolio_row['portfolio_name']
-            original_description = selected_portfolio_row['description'] or ''
-
-            with st.form("update_portfolio_form", clear_on_submit=False):
-                new_portfolio_name = st.text_input("New Portfolio Name", value=original_portfolio_name)
-                new_description = st.text_area("New Description", value=original_description)
-                update_submitted = st.form_submit_button("Update Portfolio")
-                if update_submitted:
-                    if not new_portfolio_name:
-                        st.warning("Portfolio Name cannot be empty.")
+        if st.button("Save Portfolio Changes", key="save_portfolios_button"):
+            changes = changed_rows(original_portfolios, edited_portfolios, 'portfolio_id', ['portfolio_name', 'description'])
+            if not changes:
+                st.info("No changes detected to update.")
+            elif any(not row['portfolio_name'] for _, row in changes):
+                st.warning("Portfolio Name cannot be empty.")
+            else:
+                try:
+                    if db.update_portfolios_bulk([(portfolio_id, row['portfolio_name'], row['description']) for portfolio_id, row in changes]):
+                        st.success(f"{len(changes)} portfolio(s) updated successfully!")
+                        refresh_frames('portfolios_df', 'investments_df') # Investments show the portfolio name
+                        st.rerun(scope="fragment")
                     else:
-                        if new_portfolio_name == original_portfolio_name and new_description == original_description:
-                            st.info("No changes detected to update.")
-                        else:
-                            try:
-                                if db.update_portfolio(portfolio_id_to_update, new_portfolio_name, new_description):
-                                    st.success(f"Portfolio '{new_portfolio_name}' updated successfully!")
-                                    refresh_data()
-                                    st.session_state['last_selected_portfolio_name'] = new_portfolio_name
-                                    st.rerun()
-                                else:
-                                    st.error("Failed to update portfolio. No changes were applied or a database error occurred.")
-                            except Error as e:
-                                if e.errno == 1062:
-                                    st.error("Failed to update portfolio: A portfolio with this name already exists for you.")
-                                else:
-                                    st.error(f"Failed to update portfolio: Database error - {e}")
+                        st.error("Failed to update portfolios. No changes were applied or a database error occurred.")
+                except Error as e:
+                    if e.errno == 1062:
+                        st.error("Failed to update portfolios: A portfolio with this name already exists for you.")
+                    else:
+                        st.error(f"Failed to update portfolios: Database error - {e}")
     else:
         st.info("No portfolios to update.")
 
 
     st.subheader("Delete Portfolio")
     if not st.session_state.portfolios_df.empty:
-        portfolio_names = st.session_state.portfolios_df['portfolio_name'].tolist()
-        default_delete_index = 0
-        if 'last_selected_portfolio_name' in st.session_state and st.session_state['last_selected_portfolio_name'] in portfolio_names:
-            default_delete_index = portfolio_names.index(st.session_state['last_selected_portfolio_name'])
-        
+        # The widget key keeps the selection across reruns; no index= lookup needed
         portfolio_to_delete = st.selectbox(
             "Select Portfolio to Delete",
-            portfolio_names,
-            index=default_delete_index,
+            st.session_state.portfolio_names,
             key="delete_portfolio_select"
         )
         
         if portfolio_to_delete:
-            portfolio_id_to_delete = int(st.session_state.portfolios_df[st.session_state.portfolios_df['portfolio_name'] == portfolio_to_delete].iloc[0]['portfolio_id'])
+            portfolio_id_to_delete = st.session_state.portfolios_by_name[portfolio_to_delete]['portfolio_id']
             if st.button(f"Delete '{portfolio_to_delete}'", key="delete_portfolio_button"):
                 try:
                     if db.delete_portfolio(portfolio_id_to_delete):
                         st.success(f"Portfolio '{portfolio_to_delete}' deleted successfully!")
-                        refresh_data()
-                        if 'last_selected_portfolio_name' in st.session_state and st.session_state['last_selected_portfolio_name'] == portfolio_to_delete:
-                            del st.session_state['last_selected_portfolio_name']
-                        st.rerun()
+                        refresh_frames('portfolios_df')
+                        st.rerun(scope="fragment")
                     else:
                         st.error("Failed to delete portfolio. No rows were affected or a database error occurred.")
                 except Error as e:
@@ -609,6 +943,7 @@ def manage_portfolios():
         st.info("No portfolios to delete.")
 
 # --- Account Management Section ---
+@st.fragment
 def manage_accounts():
     st.title("💰 Manage Accounts")
 
@@ -631,8 +966,8 @@ def manage_accounts():
                     account_id = db.add_account(st.session_state.user_id, account_name, account_type, initial_balance, currency)
                     if account_id:
                         st.success(f"Account '{account_name}' added successfully!")
-                        refresh_data()
-                        st.rerun()
+                        refresh_frames('accounts_df')
+                        st.rerun(scope="fragment")
                     else:
                         st.error("Failed to add account. No rows were affected or a database error occurred.")
                 except Error as e:
@@ -643,33 +978,33 @@ def manage_accounts():
             else:
                 st.warning("Account Name and Type are required.")
 
-    st.subheader("Update Account Balance")
+    st.subheader("Update Account Balances")
     if not st.session_state.accounts_df.empty:
-        account_to_update = st.selectbox(
-            "Select Account to Update Balance",
-            st.session_state.accounts_df['account_name'].tolist(),
-            key="update_account_select"
+        # Balances are Decimal in session_state; the editor works on floats
+        original_accounts = st.session_state.accounts_df[['account_id', 'account_name', 'current_balance']].astype({'current_balance': float})
+        edited_accounts = st.data_editor(
+            original_accounts,
+            num_rows="fixed",
+            disabled=['account_id', 'account_name'],
+            hide_index=True,
+            column_config={'current_balance': st.column_config.NumberColumn("Current Balance", format="%.2f")},
+            use_container_width=True,
+            key=f"account_editor_{data_version()}"
         )
-        if account_to_update:
-            selected_account_row = st.session_state.accounts_df[st.session_state.accounts_df['account_name'] == account_to_update].iloc[0]
-            account_id = selected_account_row['account_id']
-
-            new_balance = st.number_input(
-                f"New Balance for {account_to_update} (Current: ${selected_account_row['current_balance']:.2f})",
-                value=float(selected_account_row['current_balance']),
-                format="%.2f",
-                key="new_balance_input"
-            )
-            if st.button("Update Balance", key="update_balance_button"):
+        if st.button("Save Balance Changes", key="update_balance_button"):
+            changes = changed_rows(original_accounts, edited_accounts, 'account_id', ['current_balance'])
+            if not changes:
+                st.info("No changes detected to update.")
+            else:
                 try:
-                    if db.update_account_balance(int(account_id), new_balance):
-                        st.success(f"Balance for '{account_to_update}' updated to ${new_balance:.2f}!")
-                        refresh_data()
-                        st.rerun()
+                    if db.update_account_balances_bulk([(account_id, Decimal(str(row['current_balance']))) for account_id, row in changes]):
+                        st.success(f"{len(changes)} account balance(s) updated successfully!")
+                        refresh_frames('accounts_df')
+                        st.rerun(scope="fragment")
                     else:
-                        st.error("Failed to update account balance. No rows were affected or a database error occurred.")
+                        st.error("Failed to update account balances. No rows were affected or a database error occurred.")
                 except Error as e:
-                    st.error(f"Failed to update account balance: Database error - {e}")
+                    st.error(f"Failed to update account balances: Database error - {e}")
     else:
         st.info("No accounts to update.")
 
@@ -678,17 +1013,17 @@ def manage_accounts():
     if not st.session_state.accounts_df.empty:
         account_to_delete = st.selectbox(
             "Select Account to Delete",
-            st.session_state.accounts_df['account_name'].tolist(),
+            st.session_state.account_names,
             key="delete_account_select"
         )
         if account_to_delete:
-            account_id_to_delete = int(st.session_state.accounts_df[st.session_state.accounts_df['account_name'] == account_to_delete].iloc[0]['account_id'])
+            account_id_to_delete = st.session_state.accounts_by_name[account_to_delete]['account_id']
             if st.button(f"Delete '{account_to_delete}'", key="delete_account_button"):
                 try:
                     if db.delete_account(account_id_to_delete):
                         st.success(f"Account '{account_to_delete}' deleted successfully!")
-                        refresh_data()
-                        st.rerun()
+                        refresh_frames('accounts_df')
+                        st.rerun(scope="fragment")
                     else:
                         st.error("Failed to delete account. No rows were affected or a database error occurred.")
                 except Error as e:
@@ -697,17 +1032,18 @@ def manage_accounts():
         st.info("No accounts to delete.")
 
 # --- Investment Management (User/Admin) ---
+@st.fragment
 def manage_investments():
     st.title("📈 Manage Investments")
 
     # Determine which DataFrame to use based on role
     if st.session_state.user_role == 'admin':
-        display_df = st.session_state.all_investments_df
         st.subheader("All Investments Across Users")
-        if not display_df.empty:
-            st.dataframe(display_df[['username', 'portfolio_name', 'investment_name', 'symbol', 'asset_name', 'asset_category_name', 'quantity', 'current_unit_price', 'current_value', 'currency']], use_container_width=True)
-        else:
-            st.info("No investments found across all users.")
+        admin_table_fragment(
+            'all_investments_df', 'admin_investments', "Show all investments", "admin_manage_show_investments",
+            ADMIN_INVESTMENT_FIELDS,
+            "No investments found across all users."
+        )
         # Admin does not have direct forms to add/update/delete individual user investments here.
         # This page is primarily for viewing all investments.
         # If admin needs to modify, it would be a more complex UI (e.g., select user, then investment).
@@ -715,9 +1051,12 @@ def manage_investments():
 
     else: # Regular user
         display_df = st.session_state.investments_df
+        # Shared by the Update and Delete selectboxes below
+        investment_names = st.session_state.investment_names
+        investments_by_name = st.session_state.investments_by_name
         st.subheader("Your Investments")
         if not display_df.empty:
-            st.dataframe(display_df[['investment_name', 'symbol', 'asset_name', 'asset_category_name', 'quantity', 'current_unit_price', 'current_value', 'currency']], use_container_width=True)
+            st.dataframe(display_df[USER_INVESTMENT_COLUMNS], use_container_width=True)
         else:
             st.info("You don't have any investments yet. Use 'Buy Assets' to add one.")
 
@@ -728,29 +1067,29 @@ def manage_investments():
             symbol = st.text_input("Symbol (Optional, e.g., AAPL, BTC)")
 
             # Select Portfolio
-            portfolio_options = st.session_state.portfolios_df['portfolio_name'].tolist() if not st.session_state.portfolios_df.empty else []
+            portfolio_options = st.session_state.portfolio_names
             selected_portfolio_name = st.selectbox("Select Portfolio", portfolio_options, key="add_investment_portfolio_select")
             portfolio_id = None
             if selected_portfolio_name:
-                portfolio_id = int(st.session_state.portfolios_df[st.session_state.portfolios_df['portfolio_name'] == selected_portfolio_name].iloc[0]['portfolio_id'])
+                portfolio_id = st.session_state.portfolios_by_name[selected_portfolio_name]['portfolio_id']
             else:
                 st.warning("Please create a portfolio first in 'Manage Portfolios' to add investments.")
 
             # Select Asset Category
-            asset_type_options = st.session_state.asset_types_df['type_name'].tolist() if not st.session_state.asset_types_df.empty else []
+            asset_type_options = st.session_state.asset_type_names
             selected_asset_type_name = st.selectbox("Select Asset Category", asset_type_options, key="add_investment_asset_type_select")
             asset_category_id = None
             if selected_asset_type_name:
-                asset_category_id = int(st.session_state.asset_types_df[st.session_state.asset_types_df['type_name'] == selected_asset_type_name].iloc[0]['asset_type_id'])
+                asset_category_id = st.session_state.asset_types_by_name[selected_asset_type_name]['asset_type_id']
             else:
                 st.warning("No asset categories found. Please ensure asset types are in the database.")
 
             # Select Specific Asset
-            asset_options = st.session_state.assets_df['name'].tolist() if not st.session_state.assets_df.empty else []
+            asset_options = st.session_state.asset_names
             selected_asset_name = st.selectbox("Select Specific Asset (e.g., Gold, Bitcoin)", asset_options, key="add_investment_asset_select")
             asset_id = None
             if selected_asset_name:
-                asset_id = int(st.session_state.assets_df[st.session_state.assets_df['name'] == selected_asset_name].iloc[0]['asset_id'])
+                asset_id = st.session_state.assets_by_name[selected_asset_name]['asset_id']
             else:
                 st.warning("No specific assets found. Please contact admin to add assets.")
 
@@ -768,8 +1107,8 @@ def manage_investments():
                         investment_id = db.add_investment(st.session_state.user_id, portfolio_id, asset_category_id, asset_id, investment_name, symbol, initial_investment_amount, purchase_date, quantity, currency, notes)
                         if investment_id:
                             st.success(f"Investment '{investment_name}' added successfully!")
-                            refresh_data()
-                            st.rerun()
+                            refresh_frames('investments_df')
+                            st.rerun(scope="fragment")
                         else:
                             st.error("Failed to add investment. No rows were affected or a database error occurred.")
                     except Error as e:
@@ -787,48 +1126,78 @@ def manage_investments():
                         st.error("Please select a valid Specific Asset.")
 
 
+        st.subheader("Add Multiple Investments (CSV)")
+        st.caption("Columns: " + ", ".join(BULK_INVESTMENT_COLUMNS) + ". Portfolio, category and asset are given by name; currency and notes are optional.")
+        with st.form("bulk_add_investments_form", clear_on_submit=True):
+            uploaded_csv = st.file_uploader("Investments CSV", type="csv", key="bulk_investments_csv")
+            bulk_submitted = st.form_submit_button("Add Investments")
+            if bulk_submitted:
+                if uploaded_csv is None:
+                    st.warning("Please upload a CSV file.")
+                else:
+                    try:
+                        rows, row_errors = parse_bulk_investments(pd.read_csv(uploaded_csv))
+                    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+                        rows, row_errors = [], [f"Could not read the uploaded CSV: {e}"]
+                    if row_errors:
+                        for row_error in row_errors:
+                            st.error(row_error)
+                    elif not rows:
+                        st.warning("The uploaded file has no investments.")
+                    else:
+                        try:
+                            added = db.add_investments_bulk(st.session_state.user_id, rows)
+                            if added:
+                                st.success(f"{added} investments added successfully!")
+                                refresh_frames('investments_df') # Once for the whole batch
+                                st.rerun(scope="fragment")
+                            else:
+                                st.error("Failed to add investments. A database error occurred.")
+                        except Error as e:
+                            st.error(f"Failed to add investments: Database error - {e}. No rows were added.")
+
         st.subheader("Update Investment")
         if not display_df.empty: # Use display_df for consistency
             investment_to_update_name = st.selectbox(
                 "Select Investment to Update",
-                display_df['investment_name'].tolist(),
+                investment_names,
                 key="update_investment_select"
             )
             if investment_to_update_name:
-                selected_investment_row = display_df[display_df['investment_name'] == investment_to_update_name].iloc[0]
-                investment_id = int(selected_investment_row['investment_id'])
+                selected_investment_row = investments_by_name[investment_to_update_name]
+                investment_id = selected_investment_row['investment_id']
 
                 with st.form("update_investment_form", clear_on_submit=False):
                     new_investment_name = st.text_input("Investment Name", value=selected_investment_row['investment_name'])
                     new_symbol = st.text_input("Symbol", value=selected_investment_row['symbol'] or '')
 
                     # Select Portfolio for update
-                    portfolio_options = st.session_state.portfolios_df['portfolio_name'].tolist() if not st.session_state.portfolios_df.empty else []
+                    portfolio_options = st.session_state.portfolio_names
                     current_portfolio_name = selected_investment_row['portfolio_name']
                     default_portfolio_index = portfolio_options.index(current_portfolio_name) if current_portfolio_name in portfolio_options else 0
                     new_selected_portfolio_name = st.selectbox("Select Portfolio", portfolio_options, index=default_portfolio_index, key="update_investment_portfolio_select")
                     new_portfolio_id = None
                     if new_selected_portfolio_name:
-                        new_portfolio_id = int(st.session_state.portfolios_df[st.session_state.portfolios_df['portfolio_name'] == new_selected_portfolio_name].iloc[0]['portfolio_id'])
+                        new_portfolio_id = st.session_state.portfolios_by_name[new_selected_portfolio_name]['portfolio_id']
 
 
                     # Select Asset Category for update
-                    asset_type_options = st.session_state.asset_types_df['type_name'].tolist() if not st.session_state.asset_types_df.empty else []
+                    asset_type_options = st.session_state.asset_type_names
                     current_asset_category_name = selected_investment_row['asset_category_name']
                     default_asset_type_index = asset_type_options.index(current_asset_category_name) if current_asset_category_name in asset_type_options else 0
                     new_selected_asset_category_name = st.selectbox("Select Asset Category", asset_type_options, index=default_asset_type_index, key="update_investment_asset_type_select")
                     new_asset_category_id = None
                     if new_selected_asset_category_name:
-                        new_asset_category_id = int(st.session_state.asset_types_df[st.session_state.asset_types_df['type_name'] == new_selected_asset_category_name].iloc[0]['asset_type_id'])
+                        new_asset_category_id = st.session_state.asset_types_by_name[new_selected_asset_category_name]['asset_type_id']
 
                     # Select Specific Asset for update
-                    asset_options = st.session_state.assets_df['name'].tolist() if not st.session_state.assets_df.empty else []
+                    asset_options = st.session_state.asset_names
                     current_asset_name = selected_investment_row['asset_name']
                     default_asset_index = asset_options.index(current_asset_name) if current_asset_name in asset_options else 0
                     new_selected_asset_name = st.selectbox("Select Specific Asset", asset_options, index=default_asset_index, key="update_investment_specific_asset_select")
                     new_asset_id = None
                     if new_selected_asset_name:
-                        new_asset_id = int(st.session_state.assets_df[st.session_state.assets_df['name'] == new_selected_asset_name].iloc[0]['asset_id'])
+                        new_asset_id = st.session_state.assets_by_name[new_selected_asset_name]['asset_id']
 
 
                     new_initial_investment_amount = st.number_input("Initial Investment Amount", value=float(selected_investment_row['initial_investment_amount'] or 0.00), format="%.2f")
@@ -839,7 +1208,22 @@ def manage_investments():
 
                     update_submitted = st.form_submit_button("Update Investment")
                     if update_submitted:
-                        if new_investment_name and new_portfolio_id is not None and new_asset_category_id is not None and new_asset_id is not None:
+                        # Compared as the widgets present them, so an untouched form matches exactly
+                        original_values = (
+                            selected_investment_row['investment_name'], selected_investment_row['symbol'] or '',
+                            selected_investment_row['portfolio_id'], selected_investment_row['asset_category_id'], selected_investment_row['asset_id'],
+                            float(selected_investment_row['initial_investment_amount'] or 0.00), selected_investment_row['purchase_date'],
+                            float(selected_investment_row['quantity']), selected_investment_row['currency'], selected_investment_row['notes'] or ''
+                        )
+                        new_values = (
+                            new_investment_name, new_symbol,
+                            new_portfolio_id, new_asset_category_id, new_asset_id,
+                            new_initial_investment_amount, new_purchase_date,
+                            new_quantity, new_currency, new_notes or ''
+                        )
+                        if new_values == original_values:
+                            st.info("No changes detected to update.")
+                        elif new_investment_name and new_portfolio_id is not None and new_asset_category_id is not None and new_asset_id is not None:
                             try:
                                 if db.update_investment(
                                     investment_id,
@@ -855,8 +1239,8 @@ def manage_investments():
                                     new_asset_id
                                 ):
                                     st.success(f"Investment '{new_investment_name}' updated successfully!")
-                                    refresh_data()
-                                    st.rerun()
+                                    refresh_frames('investments_df')
+                                    st.rerun(scope="fragment")
                                 else:
                                     st.error("Failed to update investment. No rows were affected or a database error occurred.")
                             except Error as e:
@@ -873,17 +1257,17 @@ def manage_investments():
         if not display_df.empty: # Use display_df for consistency
             investment_to_delete_name = st.selectbox(
                 "Select Investment to Delete",
-                display_df['investment_name'].tolist(),
+                investment_names,
                 key="delete_investment_select"
             )
             if investment_to_delete_name:
-                investment_id_to_delete = int(display_df[display_df['investment_name'] == investment_to_delete_name].iloc[0]['investment_id'])
+                investment_id_to_delete = investments_by_name[investment_to_delete_name]['investment_id']
                 if st.button(f"Delete '{investment_to_delete_name}'", key="delete_investment_button"):
                     try:
                         if db.delete_investment(investment_id_to_delete):
                             st.success(f"Investment '{investment_to_delete_name}' deleted successfully!")
-                            refresh_data()
-                            st.rerun()
+                            refresh_frames('investments_df')
+                            st.rerun(scope="fragment")
                         else:
                             st.error("Failed to delete investment. No rows were affected or a database error occurred.")
                     except Error as e:
@@ -891,18 +1275,55 @@ def manage_investments():
         else:
             st.info("No investments to delete.")
 
+# Columns expected in the bulk investment CSV, in add_investment() order
+BULK_INVESTMENT_COLUMNS = ('portfolio_name', 'asset_category_name', 'asset_name', 'investment_name', 'symbol', 'initial_investment_amount', 'purchase_date', 'quantity', 'currency', 'notes')
+
+def parse_bulk_investments(csv_df):
+    """Turns an uploaded investments CSV into db.add_investments_bulk() rows.
+    Names are resolved to ids through the session's name lookups.
+    Returns (rows, errors); rows should only be written if errors is empty."""
+    missing = [c for c in BULK_INVESTMENT_COLUMNS if c not in csv_df.columns and c not in ('symbol', 'currency', 'notes')]
+    if missing:
+        return [], [f"Missing CSV columns: {', '.join(missing)}"]
+
+    csv_df = csv_df.astype(object).where(csv_df.notna(), None)
+    rows, errors = [], []
+    for line, record in enumerate(csv_df.to_dict('records'), start=2): # Line 1 is the header
+        portfolio = st.session_state.portfolios_by_name.get(record['portfolio_name'])
+        asset_type = st.session_state.asset_types_by_name.get(record['asset_category_name'])
+        asset = st.session_state.assets_by_name.get(record['asset_name'])
+        if not record['investment_name'] or portfolio is None or asset_type is None or asset is None:
+            errors.append(f"Line {line}: investment_name and a known portfolio, asset category and asset are required.")
+            continue
+        if pd.isna(record['purchase_date']):
+            errors.append(f"Line {line}: purchase_date is required.")
+            continue
+        try:
+            rows.append((
+                portfolio['portfolio_id'], asset_type['asset_type_id'], asset['asset_id'],
+                record['investment_name'], record.get('symbol'),
+                Decimal(str(record['initial_investment_amount'] or 0)),
+                pd.to_datetime(record['purchase_date']).date(),
+                Decimal(str(record['quantity'] or 0)),
+                record.get('currency') or 'USD', record.get('notes')
+            ))
+        except (ValueError, ArithmeticError):
+            errors.append(f"Line {line}: invalid amount, quantity or purchase_date.")
+    return rows, errors
+
 # --- Transaction Management Section ---
+@st.fragment
 def manage_transactions():
     st.title("💸 Manage Transactions")
 
     # Determine which DataFrame to use based on role
     if st.session_state.user_role == 'admin':
-        display_df = st.session_state.all_transactions_df
         st.subheader("All Transactions Across Users")
-        if not display_df.empty:
-            st.dataframe(display_df[['transaction_date', 'username', 'transaction_type', 'amount', 'quantity', 'asset_name', 'account_name', 'description']], use_container_width=True)
-        else:
-            st.info("No transactions recorded across all users.")
+        admin_table_fragment(
+            'all_transactions_df', 'admin_transactions', "Show all transactions", "admin_manage_show_transactions",
+            ADMIN_TRANSACTION_FIELDS,
+            "No transactions recorded across all users."
+        )
         # Admin does not have direct forms to add/update/delete individual user transactions here.
         # This page is primarily for viewing all transactions.
     else: # Regular user
@@ -910,7 +1331,7 @@ def manage_transactions():
         st.subheader("Your Transactions")
         if not display_df.empty:
             # Display asset_name and quantity for asset-related transactions
-            st.dataframe(display_df[['transaction_date', 'transaction_type', 'amount', 'quantity', 'asset_name', 'account_name', 'description']], use_container_width=True)
+            st.dataframe(display_df[USER_TRANSACTION_COLUMNS], use_container_width=True)
         else:
             st.info("You don't have any transactions yet. Please add an account or make a purchase to see transactions.")
 
@@ -924,31 +1345,31 @@ def manage_transactions():
             # Safely get account options
             account_options = ["None"]
             if not st.session_state.accounts_df.empty:
-                account_options = ["None"] + st.session_state.accounts_df['account_name'].tolist()
+                account_options = ["None"] + st.session_state.account_names
             
             selected_account_name = st.selectbox("Link to Account", account_options, key="add_trans_account_select")
             account_id = None
             if selected_account_name != "None":
-                account_id = int(st.session_state.accounts_df[st.session_state.accounts_df['account_name'] == selected_account_name].iloc[0]['account_id'])
+                account_id = st.session_state.accounts_by_name[selected_account_name]['account_id']
 
             # Optional: Link to an existing investment and/or asset for manual 'Buy'/'Sell' type transactions
             investment_options = ["None"]
             if not st.session_state.investments_df.empty:
-                investment_options = ["None"] + st.session_state.investments_df['investment_name'].tolist()
+                investment_options = ["None"] + st.session_state.investment_names
 
             selected_investment_name = st.selectbox("Link to Existing Investment (Optional)", investment_options, key="add_trans_investment_select")
             investment_id = None
             if selected_investment_name != "None":
-                investment_id = int(st.session_state.investments_df[st.session_state.investments_df['investment_name'] == selected_investment_name].iloc[0]['investment_id'])
+                investment_id = st.session_state.investments_by_name[selected_investment_name]['investment_id']
             
             asset_options = ["None"]
             if not st.session_state.assets_df.empty:
-                asset_options = ["None"] + st.session_state.assets_df['name'].tolist()
+                asset_options = ["None"] + st.session_state.asset_names
 
             selected_asset_name = st.selectbox("Link to Specific Asset (Optional)", asset_options, key="add_trans_asset_select")
             asset_id = None
             if selected_asset_name != "None":
-                asset_id = int(st.session_state.assets_df[st.session_state.assets_df['name'] == selected_asset_name].iloc[0]['asset_id'])
+                asset_id = st.session_state.assets_by_name[selected_asset_name]['asset_id']
 
             # Quantity and Unit Price at Transaction for manual Buy/Sell
             manual_quantity = st.number_input("Quantity (for Buy/Sell transactions)", value=0.00, format="%.4f", key="manual_trans_quantity")
@@ -971,8 +1392,8 @@ def manage_transactions():
                         )
                         if transaction_id:
                             st.success(f"Transaction added successfully!")
-                            refresh_data()
-                            st.rerun()
+                            refresh_frames('transactions_df')
+                            st.rerun(scope="fragment")
                         else:
                             st.error("Failed to add transaction. No rows were affected or a database error occurred.")
                     except Error as e:
@@ -982,27 +1403,25 @@ def manage_transactions():
 
         st.subheader("Delete Transaction")
         if not display_df.empty: # Use display_df for consistency
-            transaction_display_options_with_ids = [
-                (f"{row['transaction_date'].strftime('%Y-%m-%d %H:%M')} - {row['transaction_type']} {row['amount']:.2f} ({row['description'] or 'No description'})", row['transaction_id'])
-                for index, row in display_df.iterrows()
-            ]
-            transaction_display_strings = [item[0] for item in transaction_display_options_with_ids]
+            transaction_labels, transaction_ids = make_transaction_labels(display_df, frame_token('transactions_df'))
 
-            selected_transaction_display = st.selectbox(
+            # Options are positions into transaction_ids, so identical labels stay distinct
+            selected_transaction_index = st.selectbox(
                 "Select Transaction to Delete",
-                transaction_display_strings,
+                range(len(transaction_ids)),
+                format_func=transaction_labels.__getitem__,
                 key="delete_transaction_select"
             )
-            if selected_transaction_display:
-                transaction_id_to_delete = next((item[1] for item in transaction_display_options_with_ids if item[0] == selected_transaction_display), None)
+            if selected_transaction_index is not None:
+                transaction_id_to_delete = transaction_ids[selected_transaction_index]
 
                 if transaction_id_to_delete is not None:
                     if st.button(f"Delete Selected Transaction", key="delete_transaction_button"):
                         try:
-                            if db.delete_transaction(int(transaction_id_to_delete)):
+                            if db.delete_transaction(transaction_id_to_delete):
                                 st.success(f"Transaction deleted successfully!")
-                                refresh_data()
-                                st.rerun()
+                                refresh_frames('transactions_df')
+                                st.rerun(scope="fragment")
                             else:
                                 st.error("Failed to delete transaction. No rows were affected or a database error occurred.")
                         except Error as e:
@@ -1013,22 +1432,52 @@ def manage_transactions():
             st.info("No transactions to delete.")
 
 
+@st.fragment
+def _sidebar_user_footer():
+    """Logged-in user footer. Its inputs don't change mid-session, and as a fragment
+    it isn't re-executed by the reruns of the page fragments."""
+    st.markdown("---")
+    st.info(f"Logged in as: **{st.session_state.username}** (Role: **{st.session_state.user_role}**) (ID: {st.session_state.user_id})")
+
+# --- Page Routes ---
+# Navigation options (in sidebar order) mapped to the function that renders each page
+ADMIN_ROUTES = {
+    "Admin Dashboard": show_admin_dashboard,
+    "Manage Investments": manage_investments, # Admin can view all investments here
+    "Manage Transactions": manage_transactions, # Admin can view all transactions here
+    # No "Manage Portfolios" or "Manage Accounts" for admin
+}
+USER_ROUTES = {
+    "Dashboard": show_dashboard,
+    "Buy Assets": buy_assets,
+    "Manage Portfolios": manage_portfolios,
+    "Manage Accounts": manage_accounts,
+    "Manage Investments": manage_investments,
+    "Manage Transactions": manage_transactions,
+}
+
+def build_pages(routes):
+    """Turns a route table into st.Page entries for st.navigation, in sidebar order.
+    url_path is explicit since several handlers are wrapped by @st.fragment."""
+    return [
+        st.Page(handler, title=title, url_path=title.lower().replace(' ', '-'), default=(i == 0))
+        for i, (title, handler) in enumerate(routes.items())
+    ]
+
 # --- Main Application Logic ---
-if 'logged_in' not in st.session_state:
-    st.session_state.logged_in = False
-if 'user_id' not in st.session_state:
-    st.session_state.user_id = None
-if 'username' not in st.session_state:
-    st.session_state.username = None
-if 'user_role' not in st.session_state:
-    st.session_state.user_role = None # Initialize user role
-
-# Check and add admin user on first run if not exists
-admin_user_data = db.get_user_by_username(ADMIN_USERNAME)
-if not admin_user_data:
+# One setdefault per key: a single lookup, and no write once the key exists
+st.session_state.setdefault('logged_in', False)
+st.session_state.setdefault('user_id', None)
+st.session_state.setdefault('username', None)
+st.session_state.setdefault('user_role', None) # Initialize user role
+
+# Check and add admin user on first run if not exists.
+# ensure_admin_user() is cached per process; a failed creation is retried on the next rerun.
+if 'admin_checked' not in st.session_state:
     try:
-        db.add_user(ADMIN_USERNAME, hash_password(ADMIN_PASSWORD), 'admin@wealth.com', 'admin')
-        st.sidebar.success("Admin user created. Please log in as admin.")
+        if ensure_admin_user().pop('created', False):
+            st.sidebar.success("Admin user created. Please log in as admin.")
+        st.session_state.admin_checked = True
     except Exception as e:
         st.sidebar.warning(f"Could not create admin user automatically: {e}")
 
@@ -1037,84 +1486,33 @@ if not st.session_state.logged_in:
     show_auth_section()
     st.info("Please Login or Register to access the Wealth Management System.")
 else:
-    st.sidebar.title("Navigation")
-    
-    # Determine navigation options based on user role
-    if st.session_state.user_role == 'admin':
-        navigation_options = [
-            "Admin Dashboard",
-            "Manage Investments", # Admin can view all investments here
-            "Manage Transactions", # Admin can view all transactions here
-            # Removed "Manage Portfolios" and "Manage Accounts" for admin
-        ]
-    else: # Regular user
-        navigation_options = [
-            "Dashboard",
-            "Buy Assets",
-            "Manage Portfolios",
-            "Manage Accounts",
-            "Manage Investments",
-            "Manage Transactions"
-        ]
-
-    if 'current_page' not in st.session_state:
-        st.session_state['current_page'] = navigation_options[0] # Default to first option
-
-    # If the current page is not in the new navigation options, reset it to the first option
-    if st.session_state['current_page'] not in navigation_options:
-        st.session_state['current_page'] = navigation_options[0]
-        st.rerun() # Force a rerun to apply the new page selection
-
-    page = st.sidebar.radio(
-        "Go to",
-        navigation_options,
-        index=navigation_options.index(st.session_state['current_page']),
-        key="main_navigation_radio"
-    )
-    
-    if page != st.session_state['current_page']:
-        st.session_state['current_page'] = page
-        st.rerun()
+    # st.navigation draws the page menu in the sidebar and remembers the selection
+    # itself; pages the role can't see simply aren't registered
+    routes = ADMIN_ROUTES if st.session_state.user_role == 'admin' else USER_ROUTES
+    current_page = st.navigation(build_pages(routes))
 
     if st.sidebar.button("Logout", key="logout_button"):
         st.session_state.logged_in = False
         st.session_state.user_id = None
         st.session_state.username = None
         st.session_state.user_role = None
-        # Clear all dataframes from session state to ensure fresh load on next login
-        for key in list(st.session_state.keys()):
-            if key.endswith('_df') or key == 'portfolio_summary' or key.startswith('last_selected_'):
-                st.session_state.pop(key, None)
-        # Crucially, pop 'current_page' to ensure it resets for the next login
-        st.session_state.pop('current_page', None) 
+        # Clear all loaded data from session state to ensure fresh load on next login
+        clear_session_data()
         st.success("Logged out successfully.")
         st.rerun()
 
-    # Load data initially or refresh if needed based on current user and role
-    load_data(st.session_state.user_id, st.session_state.user_role)
-
-    # Route to the correct page based on selection and role
-    if st.session_state.user_role == 'admin':
-        if page == "Admin Dashboard":
-            show_admin_dashboard()
-        # Removed "Manage Portfolios" and "Manage Accounts" routing for admin
-        elif page == "Manage Investments": # Admin's view of all investments
-            manage_investments()
-        elif page == "Manage Transactions": # Admin's view of all transactions
-            manage_transactions()
-    else: # Regular user
-        if page == "Dashboard":
-            show_dashboard()
-        elif page == "Buy Assets":
-            buy_assets()
-        elif page == "Manage Portfolios":
-            manage_portfolios()
-        elif page == "Manage Accounts":
-            manage_accounts()
-        elif page == "Manage Investments":
-            manage_investments()
-        elif page == "Manage Transactions":
-            manage_transactions()
-
-    st.sidebar.markdown("---")
-    st.sidebar.info(f"Logged in as: **{st.session_state.username}** (Role: **{st.session_state.user_role}**) (ID: {st.session_state.user_id})")
+    # Load data initially or refresh if needed based on current user and role.
+    # Navigation-only reruns reuse the frames already in session_state.
+    if data_is_stale():
+        try:
+            load_data(st.session_state.user_id, st.session_state.user_role)
+        except Error as e:
+            st.error(f"Could not load your data: Database error - {e}. Please try again shortly.")
+            st.stop()
+
+    # Run only the selected page
+    current_page.run()
+
+    # Fragments can't write to st.sidebar themselves, so the call is made inside it
+    with st.sidebar:
+        _sidebar_user_footer()
@@ -1,6 +1,17 @@
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode, pooling
+from mysql.connector.errors import PoolError
 import pandas as pd
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import wraps
 from decimal import Decimal
 
 # --- Database Configuration ---
@@ -8,82 +19,755 @@ DB_CONFIG = {
     'host': 'localhost',
     'database': 'wealth_management',
     'user': 'root',
-    'password': 'root'
+    'password': 'root',
+    'allow_local_infile': False, # Nothing loads local files; keep LOAD DATA LOCAL disabled
+    # Single statements commit as they run, saving a COMMIT round trip per write.
+    # Multi-statement work opens an explicit transaction with start_transaction().
+    'autocommit': True
 }
 
+# --- Logging ---
+# Records go through a queue to a listener thread, so a slow stderr never blocks a
+# query path (or lengthens an open transaction). Level set by WMS_DB_LOG_LEVEL.
+logger = logging.getLogger("wm.db")
+if not logger.handlers: # Streamlit may re-import this module; configure once per process
+    logger.setLevel(os.environ.get('WMS_DB_LOG_LEVEL', 'WARNING').upper())
+    logger.propagate = False
+    _log_queue = queue.SimpleQueue()
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+    logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+
+# --- Connection Pool Configuration ---
+# pool_size and pool_reset_session can be tuned through the environment.
+# Skipping the session reset saves a round trip per checkout; it is safe here
+# because no code path leaves session variables or temporary tables behind.
+# Sizing: the pool is shared by the whole process. At peak it has to cover the
+# DASHBOARD_WORKERS preload threads plus one connection per session whose script is
+# running a query at that moment (an open stream_query() generator holds its connection
+# until exhausted). Roughly pool_size >= DASHBOARD_WORKERS + expected concurrent sessions;
+# the connector caps it at 32. When it is exhausted, create_connection() waits up to
+# POOL_WAIT_TIMEOUT seconds for a connection to be returned before raising PoolError.
+POOL_CONFIG = {
+    'pool_name': 'wms',
+    'pool_size': int(os.environ.get('WMS_DB_POOL_SIZE', 8)),
+    'pool_reset_session': os.environ.get('WMS_DB_POOL_RESET_SESSION', '0') == '1'
+}
+POOL_WAIT_TIMEOUT = float(os.environ.get('WMS_DB_POOL_TIMEOUT', 10))
+POOL_RETRY_INTERVAL = 0.05 # Seconds between checkout attempts while the pool is exhausted
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# --- User Lookup Cache ---
+# In-process cache of get_user_by_username() hits: username -> (expires_at, user).
+# Entries expire after USER_CACHE_TTL seconds and are dropped by add_user()/delete_user_and_all_data().
+# Shared by every session thread, so all access goes through _user_cache_lock.
+USER_CACHE_TTL = 60
+USER_CACHE_MAX_SIZE = 1024
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
+# --- Read-Mostly Lookup Cache ---
+# TTL cache for small lookups on tables that rarely change (assets, asset types, roles):
+# (function name, args, kwargs) -> (expires_at, result). Writers drop entries with invalidate_read_cache().
+READ_CACHE_TTL = 30
+# Whole reference-table DataFrames (asset types, assets) change only through this module's writers
+REFERENCE_CACHE_TTL = 300
+_read_cache = {}
+_read_cache_lock = threading.Lock()
+
+def _hashable(value):
+    """Turns list arguments (e.g. a `fields` list) into tuples so they can be part of a cache key."""
+    return tuple(_hashable(item) for item in value) if isinstance(value, list) else value
+
+def cached(ttl=READ_CACHE_TTL, copy=False):
+    """Caches the decorated read function's result per arguments for `ttl` seconds; list
+    arguments are keyed as tuples.
+    Failed lookups (None or empty results) are not cached. With copy=True each hit returns
+    result.copy(), for DataFrames that callers may modify."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__name__, tuple(_hashable(arg) for arg in args),
+                   tuple(sorted((name, _hashable(value)) for name, value in kwargs.items())))
+            with _read_cache_lock:
+                entry = _read_cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1].copy() if copy else entry[1]
+            result = func(*args, **kwargs)
+            if not (result is None or (result.empty if isinstance(result, pd.DataFrame) else not result)):
+                with _read_cache_lock:
+                    _read_cache[key] = (time.monotonic() + ttl, result)
+                if copy:
+                    return result.copy()
+            return result
+        return wrapper
+    return decorator
+
+def invalidate_read_cache(*func_names):
+    """Drops every cached result of the named functions."""
+    with _read_cache_lock:
+        for key in [k for k in _read_cache if k[0] in func_names]:
+            del _read_cache[key]
+
+# Cached reads over the assets / asset_types reference tables
+REFERENCE_READS = ('get_asset_types', 'get_asset_types_df', 'get_all_assets', 'get_assets_df', 'get_asset_by_id', 'get_asset_price')
+
+def invalidate_reference_cache():
+    """Drops every cached assets / asset_types read; called after any write to those tables."""
+    invalidate_read_cache(*REFERENCE_READS)
+
+# Per-user portfolio totals; they move with account balances, holdings and asset prices
+SUMMARY_CACHE_TTL = 60
+
+def invalidate_portfolio_summary(user_id=None):
+    """Drops the cached get_portfolio_summary() of user_id, or of every user if user_id is None
+    (for writes that only know an account / investment / asset id)."""
+    with _read_cache_lock:
+        for key in [k for k in _read_cache if k[0] == 'get_portfolio_summary'
+                    and (user_id is None or k[1][:1] == (user_id,) or dict(k[2]).get('user_id') == user_id)]:
+            del _read_cache[key]
+
+# --- Shared Read Queries ---
+# Point lookups hit on every login and purchase; most run as server-side prepared
+# statements (see PREPARED_QUERIES). All are single-row reads for execute_query(fetch_one=True).
+SQL_GET_USER_BY_USERNAME = "SELECT * FROM users WHERE username = %s LIMIT 1"
+SQL_GET_USER_ROLE = "SELECT role FROM users WHERE user_id = %s LIMIT 1"
+SQL_GET_ASSET_BY_ID = "SELECT * FROM assets WHERE asset_id = %s LIMIT 1"
+SQL_GET_ASSET_PRICE = "SELECT unit_price FROM assets WHERE asset_id = %s LIMIT 1"
+SQL_GET_INVESTMENT_BY_USER_AND_ASSET = "SELECT * FROM investments WHERE user_id = %s AND asset_id = %s LIMIT 1"
+SQL_GET_USER_BY_ID = "SELECT * FROM users WHERE user_id = %s LIMIT 1"
+SQL_GET_USERNAME = "SELECT username FROM users WHERE user_id = %s LIMIT 1"
+
+# Used both by the individual getters below and by preload_dashboard(), which
+# runs them concurrently on pooled connections.
+SQL_GET_ALL_USERS = "SELECT user_id, username, email, role, created_at FROM users"
+SQL_GET_PORTFOLIOS_BY_USER = "SELECT * FROM portfolios WHERE user_id = %s"
+SQL_GET_ACCOUNTS_BY_USER = "SELECT * FROM accounts WHERE user_id = %s"
+SQL_GET_ASSET_TYPES = "SELECT * FROM asset_types ORDER BY type_name"
+SQL_GET_ALL_ASSETS = "SELECT * FROM assets ORDER BY name"
+
+# Columns the asset list views need; the full row is fetched with get_asset_by_id()
+ASSET_LIST_COLUMNS = ('asset_id', 'name', 'unit_price', 'unit_type')
+SQL_GET_ASSET_LIST = f"SELECT {', '.join(ASSET_LIST_COLUMNS)} FROM assets ORDER BY name"
+
+SQL_GET_INVESTMENTS_BY_USER = """
+    SELECT
+        i.investment_id,
+        i.user_id,
+        i.portfolio_id,
+        p.portfolio_name,
+        i.asset_category_id,
+        at.type_name AS asset_category_name,
+        i.asset_id,
+        a.name AS asset_name,
+        a.unit_price AS current_unit_price, -- Get current price from assets table
+        a.unit_type,
+        i.investment_name,
+        i.symbol,
+        i.initial_investment_amount,
+        i.purchase_date,
+        i.quantity,
+        (i.quantity * a.unit_price) AS current_value, -- Dynamically calculate current_value
+        i.currency,
+        i.notes
+    FROM investments i
+    JOIN portfolios p ON i.portfolio_id = p.portfolio_id
+    JOIN asset_types at ON i.asset_category_id = at.asset_type_id
+    JOIN assets a ON i.asset_id = a.asset_id
+    WHERE i.user_id = %s
+    """
+# Every portfolio of a user with its holdings denormalised onto it; empty portfolios keep one row
+SQL_GET_PORTFOLIO_INVESTMENTS = """
+    SELECT
+        p.portfolio_id,
+        p.portfolio_name,
+        p.description AS portfolio_description,
+        i.investment_id,
+        i.investment_name,
+        i.symbol,
+        i.asset_id,
+        a.name AS asset_name,
+        at.type_name AS asset_category_name,
+        i.quantity,
+        a.unit_price AS current_unit_price,
+        (i.quantity * a.unit_price) AS current_value,
+        i.initial_investment_amount,
+        i.purchase_date,
+        i.currency
+    FROM portfolios p
+    LEFT JOIN investments i ON i.portfolio_id = p.portfolio_id
+    LEFT JOIN assets a ON i.asset_id = a.asset_id
+    LEFT JOIN asset_types at ON i.asset_category_id = at.asset_type_id
+    WHERE p.user_id = %s
+    ORDER BY p.portfolio_name, i.investment_name
+    """
+
+# System-wide (admin) views are built from column -> SQL expression maps so callers
+# can ask for just the columns they display (see select_columns()).
+ALL_INVESTMENTS_COLUMNS = {
+    'investment_id': 'i.investment_id',
+    'user_id': 'i.user_id',
+    'username': 'u.username',
+    'portfolio_id': 'i.portfolio_id',
+    'portfolio_name': 'p.portfolio_name',
+    'asset_category_id': 'i.asset_category_id',
+    'asset_category_name': 'at.type_name',
+    'asset_id': 'i.asset_id',
+    'asset_name': 'a.name',
+    'current_unit_price': 'a.unit_price',
+    'unit_type': 'a.unit_type',
+    'investment_name': 'i.investment_name',
+    'symbol': 'i.symbol',
+    'initial_investment_amount': 'i.initial_investment_amount',
+    'purchase_date': 'i.purchase_date',
+    'quantity': 'i.quantity',
+    'current_value': '(i.quantity * a.unit_price)',
+    'currency': 'i.currency',
+    'notes': 'i.notes'
+}
+SQL_ALL_INVESTMENTS_FROM = """
+    FROM investments i
+    JOIN users u ON i.user_id = u.user_id
+    JOIN portfolios p ON i.portfolio_id = p.portfolio_id
+    JOIN asset_types at ON i.asset_category_id = at.asset_type_id
+    JOIN assets a ON i.asset_id = a.asset_id
+    ORDER BY u.username, p.portfolio_name, i.investment_name
+    """
+
+
+SQL_GET_TRANSACTIONS_BY_USER = """
+    SELECT
+        t.transaction_id,
+        t.user_id,
+        t.account_id,
+        a.account_name,
+        t.investment_id,
+        i.investment_name,
+        t.asset_id,
+        ast.name AS asset_name, -- Alias for asset name from assets table
+        t.transaction_type,
+        t.amount,
+        t.quantity,
+        t.unit_price_at_transaction,
+        t.description,
+        t.transaction_date
+    FROM transactions t
+    LEFT JOIN accounts a ON t.account_id = a.account_id
+    LEFT JOIN investments i ON t.investment_id = i.investment_id
+    LEFT JOIN assets ast ON t.asset_id = ast.asset_id -- Join with assets table
+    WHERE t.user_id = %s
+    ORDER BY t.transaction_date DESC
+    """
+
+ALL_TRANSACTIONS_COLUMNS = {
+    'transaction_id': 't.transaction_id',
+    'user_id': 't.user_id',
+    'username': 'u.username',
+    'account_id': 't.account_id',
+    'account_name': 'a.account_name',
+    'investment_id': 't.investment_id',
+    'investment_name': 'i.investment_name',
+    'asset_id': 't.asset_id',
+    'asset_name': 'ast.name',
+    'transaction_type': 't.transaction_type',
+    'amount': 't.amount',
+    'quantity': 't.quantity',
+    'unit_price_at_transaction': 't.unit_price_at_transaction',
+    'description': 't.description',
+    'transaction_date': 't.transaction_date'
+}
+SQL_ALL_TRANSACTIONS_FROM = """
+    FROM transactions t
+    JOIN users u ON t.user_id = u.user_id
+    LEFT JOIN accounts a ON t.account_id = a.account_id
+    LEFT JOIN investments i ON t.investment_id = i.investment_id
+    LEFT JOIN assets ast ON t.asset_id = ast.asset_id
+    ORDER BY t.transaction_date DESC, u.username
+    """
+
+ALL_ACCOUNTS_COLUMNS = {
+    'account_id': 'a.account_id',
+    'user_id': 'a.user_id',
+    'username': 'u.username',
+    'account_name': 'a.account_name',
+    'account_type': 'a.account_type',
+    'current_balance': 'a.current_balance',
+    'currency': 'a.currency',
+    'created_at': 'a.created_at'
+}
+SQL_ALL_ACCOUNTS_FROM = """
+    FROM accounts a
+    JOIN users u ON a.user_id = u.user_id
+    """
+
+def select_columns(column_map, from_clause, fields=None):
+    """Builds a SELECT over `from_clause` returning only `fields` (all columns if None).
+    Field names are checked against column_map, since identifiers can't be bound as parameters."""
+    fields = list(fields) if fields else list(column_map)
+    unknown = [f for f in fields if f not in column_map]
+    if unknown:
+        raise ValueError(f"Unknown columns requested: {unknown}")
+    select_list = ",\n        ".join(f"{column_map[f]} AS {f}" for f in fields)
+    return f"SELECT\n        {select_list}{from_clause}"
+
+def paginate(query, limit=None, offset=0):
+    """Appends LIMIT/OFFSET to an ordered query. Returns (query, params); no-op if limit is None."""
+    if limit is None:
+        return query, ()
+    return f"{query} LIMIT %s OFFSET %s", (int(limit), int(offset))
+
+SQL_GET_ALL_ACCOUNTS = select_columns(ALL_ACCOUNTS_COLUMNS, SQL_ALL_ACCOUNTS_FROM)
+SQL_GET_ALL_INVESTMENTS_DETAILED = select_columns(ALL_INVESTMENTS_COLUMNS, SQL_ALL_INVESTMENTS_FROM)
+SQL_GET_ALL_TRANSACTIONS_DETAILED = select_columns(ALL_TRANSACTIONS_COLUMNS, SQL_ALL_TRANSACTIONS_FROM)
+
+# Both portfolio totals in one round trip; COALESCE turns "no rows" into 0.00. Binds (user_id, user_id).
+SQL_GET_PORTFOLIO_SUMMARY = """
+    SELECT
+        (SELECT COALESCE(SUM(current_balance), 0.00) FROM accounts WHERE user_id = %s) AS total_account_balance,
+        (SELECT COALESCE(SUM(i.quantity * a.unit_price), 0.00)
+           FROM investments i
+           JOIN assets a ON i.asset_id = a.asset_id
+           WHERE i.user_id = %s) AS total_investment_value
+    """
+# Per-portfolio breakdown of the same dynamic value, aggregated server-side
+SQL_GET_PORTFOLIO_VALUES = """
+    SELECT
+        p.portfolio_id,
+        p.portfolio_name,
+        COUNT(i.investment_id) AS investment_count,
+        COALESCE(SUM(i.quantity * a.unit_price), 0.00) AS total_value
+    FROM portfolios p
+    LEFT JOIN investments i ON i.portfolio_id = p.portfolio_id
+    LEFT JOIN assets a ON i.asset_id = a.asset_id
+    WHERE p.user_id = %s
+    GROUP BY p.portfolio_id, p.portfolio_name
+    ORDER BY p.portfolio_name
+    """
+
+def get_pool():
+    """Returns the process-wide MySQL connection pool, creating it on first use.
+    The pool lives at module level, so it survives Streamlit reruns and is
+    shared by every session served by the same process."""
+    global _pool
+    if _pool is None:
+        with _pool_lock: # Dashboard preload threads may race to create it
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(**POOL_CONFIG, **DB_CONFIG)
+                atexit.register(close_pool)
+    return _pool
+
+def close_pool():
+    """Closes the idle pooled connections; registered to run at interpreter exit.
+    Connections still checked out are closed by their holders as usual."""
+    global _pool
+    if _pool is not None:
+        _pool._remove_connections() # The connector has no public close for pools
+        _pool = None
+
+# --- Shared Write Queries ---
+SQL_ADD_USER = "INSERT INTO users (username, password, email, role) VALUES (%s, %s, %s, %s)"
+SQL_ADD_PORTFOLIO = "INSERT INTO portfolios (user_id, portfolio_name, description) VALUES (%s, %s, %s)"
+SQL_ADD_ASSET_TYPE = "INSERT INTO asset_types (type_name, description) VALUES (%s, %s)"
+SQL_ADD_ASSET = "INSERT INTO assets (name, unit_price, unit_type) VALUES (%s, %s, %s)"
+SQL_UPDATE_ACCOUNT_BALANCE = "UPDATE accounts SET current_balance = %s WHERE account_id = %s"
+SQL_UPDATE_ASSET_PRICE = "UPDATE assets SET unit_price = %s WHERE asset_id = %s"
+SQL_DELETE_PORTFOLIO = "DELETE FROM portfolios WHERE portfolio_id = %s"
+SQL_DELETE_ACCOUNT = "DELETE FROM accounts WHERE account_id = %s"
+SQL_DELETE_INVESTMENT = "DELETE FROM investments WHERE investment_id = %s"
+SQL_DELETE_TRANSACTION = "DELETE FROM transactions WHERE transaction_id = %s"
+SQL_ADD_ACCOUNT = "INSERT INTO accounts (user_id, account_name, account_type, current_balance, currency) VALUES (%s, %s, %s, %s, %s)"
+SQL_ADD_INVESTMENT = """
+    INSERT INTO investments (user_id, portfolio_id, asset_category_id, asset_id, investment_name, symbol, initial_investment_amount, purchase_date, quantity, currency, notes)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+SQL_ADD_TRANSACTION = """
+    INSERT INTO transactions (user_id, account_id, investment_id, asset_id, transaction_type, amount, quantity, unit_price_at_transaction, description)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+
 def create_connection():
-    """Establishes a connection to the MySQL database."""
-    connection = None
+    """Borrows a connection from the pool. Calling close() on it returns it to the pool.
+    The pool already checks (and reconnects) connections on checkout, so no extra ping is sent here.
+    If every pooled connection is in use, waits up to POOL_WAIT_TIMEOUT seconds for one and then
+    raises PoolError, so a busy pool isn't mistaken for "no rows". Returns None if the
+    database can't be reached."""
+    deadline = time.monotonic() + POOL_WAIT_TIMEOUT
+    while True:
+        try:
+            return get_pool().get_connection()
+        except PoolError as e:
+            if time.monotonic() >= deadline:
+                logger.error("No pooled connection became free within %ss: %s", POOL_WAIT_TIMEOUT, e)
+                raise e
+            time.sleep(POOL_RETRY_INTERVAL)
+        except Error as e:
+            logger.error("Error connecting to MySQL database: %s", e)
+            return None
+
+@contextmanager
+def db_connection():
+    """Borrows a pooled connection for the `with` block and always returns it to the pool.
+    Yields None if no connection can be obtained."""
+    connection = create_connection()
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        if connection.is_connected():
-            return connection
-    except Error as e:
-        print(f"Error connecting to MySQL database: {e}")
-        return None
+        yield connection
+    finally:
+        if connection is not None:
+            connection.close()
 
-def execute_query(query, params=None, fetch=False):
+@contextmanager
+def db_cursor(dictionary=False):
+    """Like db_connection(), but also opens a cursor that is closed on exit.
+    Yields (connection, cursor), or (None, None) if no connection can be obtained."""
+    with db_connection() as connection:
+        if connection is None:
+            yield None, None
+            return
+        cursor = connection.cursor(dictionary=dictionary)
+        try:
+            yield connection, cursor
+        finally:
+            cursor.close()
+
+# Frequent statements that execute_query runs on a prepared cursor: the point lookups and
+# the single-row UPDATE/DELETEs. The cursor is kept on the physical connection, so the
+# server parses each statement once per connection; the set is fixed, so nothing needs evicting.
+# Skipped when pool_reset_session is on, since a session reset drops prepared statements.
+# Writes are safe to keep here: a stale statement handle is rejected by the server before
+# anything runs (ER_UNKNOWN_STMT_HANDLER), and execute_query then re-prepares and retries once.
+PREPARED_QUERIES = frozenset({SQL_GET_USER_BY_USERNAME, SQL_GET_USER_ROLE, SQL_GET_ASSET_BY_ID, SQL_GET_ASSET_PRICE,
+                              SQL_GET_INVESTMENT_BY_USER_AND_ASSET,
+                              SQL_UPDATE_ACCOUNT_BALANCE, SQL_UPDATE_ASSET_PRICE,
+                              SQL_DELETE_PORTFOLIO, SQL_DELETE_ACCOUNT, SQL_DELETE_INVESTMENT, SQL_DELETE_TRANSACTION})
+
+def _prepared_cursor(connection, query):
+    """Returns the cached prepared dictionary cursor for `query` on this physical connection,
+    creating it on first use. The cache is tied to the server session (connection_id):
+    when the pool has reconnected the connection (e.g. after wait_timeout), the old statement
+    handles no longer exist on the server, so the cache is discarded and rebuilt."""
+    raw = getattr(connection, '_cnx', connection) # Unwrap the pooled connection
+    session_id, cursors = getattr(raw, '_wms_prepared_cursors', (None, None))
+    if cursors is None or session_id != raw.connection_id:
+        cursors = {}
+        raw._wms_prepared_cursors = (raw.connection_id, cursors)
+    if query not in cursors:
+        cursors[query] = connection.cursor(prepared=True, dictionary=True)
+    return cursors[query]
+
+def _drop_prepared_cursor(connection, query):
+    raw = getattr(connection, '_cnx', connection)
+    getattr(raw, '_wms_prepared_cursors', (None, {}))[1].pop(query, None)
+
+def execute_query(query, params=None, fetch=False, op=None, fetch_one=False):
     """Executes a SQL query and optionally fetches results.
+    fetch_one=True is for single-row reads: it returns just the first row.
+    For writes, `op` ('insert', 'update' or 'delete') picks the return value without
+    inspecting the SQL text; it is inferred from the statement when omitted.
     Raises mysql.connector.Error on database operation failure.
     Returns:
         - List of dicts if fetch=True
+        - A single dict, or None if there is no row, if fetch_one=True
         - lastrowid for INSERT queries
         - True for successful UPDATE/DELETE queries (if rows affected)
         - False if no rows affected by UPDATE/DELETE
         - None if connection fails (propagated from create_connection)
     """
+    with db_connection() as connection:
+        if connection is None:
+            return None
+
+        prepared = query in PREPARED_QUERIES and not POOL_CONFIG['pool_reset_session']
+        cursor = _prepared_cursor(connection, query) if prepared else connection.cursor(dictionary=True)
+        try:
+            try:
+                cursor.execute(query, params or ())
+            except Error as e:
+                if not (prepared and e.errno == errorcode.ER_UNKNOWN_STMT_HANDLER):
+                    raise e
+                # The server dropped the statement handle without running it; re-prepare and retry once
+                _drop_prepared_cursor(connection, query)
+                cursor = _prepared_cursor(connection, query)
+                cursor.execute(query, params or ())
+            if fetch_one:
+                row = cursor.fetchone()
+                cursor.fetchall() # Drain the end of the result so the connection can be reused
+                return row
+            if fetch:
+                result = cursor.fetchall()
+                return result
+            else:
+                # Already committed by autocommit (see DB_CONFIG)
+                if op is None:
+                    op = query.lstrip()[:6].lower()
+                if op == 'insert':
+                    return cursor.lastrowid
+                elif op in ('update', 'delete'):
+                    return cursor.rowcount > 0
+                return True
+        except Error as e:
+            if prepared:
+                _drop_prepared_cursor(connection, query) # Re-prepare on the next call
+            connection.rollback()
+            logger.error("Error executing query: %s", e)
+            raise e # Re-raise the exception for app.py to catch
+        finally:
+            if not prepared: # Prepared cursors stay open for reuse
+                cursor.close()
+
+# Rows pulled from the server per fetchmany() call when streaming
+STREAM_FETCH_SIZE = 500
+
+def stream_query(query, params=None, size=STREAM_FETCH_SIZE):
+    """Executes a read query on an unbuffered cursor and yields rows (dicts) as they arrive,
+    so large results are never held in full by the connector.
+    The connection is returned to the pool once the generator is exhausted or closed.
+    Raises mysql.connector.Error on database operation failure.
+    """
     connection = create_connection()
     if connection is None:
-        return None
+        return
 
-    cursor = connection.cursor(dictionary=True)
+    cursor = connection.cursor(dictionary=True, buffered=False)
     try:
         cursor.execute(query, params or ())
-        if fetch:
-            result = cursor.fetchall()
-            return result
-        else:
-            connection.commit()
-            if query.strip().upper().startswith("INSERT"):
-                return cursor.lastrowid
-            elif query.strip().upper().startswith(("UPDATE", "DELETE")):
-                return cursor.rowcount > 0
-            return True
+        while True:
+            rows = cursor.fetchmany(size)
+            if not rows:
+                break
+            yield from rows
     except Error as e:
-        connection.rollback()
-        print(f"Error executing query: {e}")
-        raise e # Re-raise the exception for app.py to catch
+        logger.error("Error streaming query: %s", e)
+        raise e
     finally:
-        if connection.is_connected():
+        try:
             cursor.close()
-            connection.close()
+        except Error:
+            # An abandoned stream leaves unread rows behind; drain them before the connection is reused
+            connection.consume_results()
+        connection.close()
+
+def query_df(query, params=None, dtypes=None):
+    """Runs a read query and returns the result as a DataFrame.
+    Fetches plain row tuples and builds the frame with DataFrame.from_records and the
+    cursor's column names, skipping the per-row dicts of the dictionary cursor.
+    `dtypes` is applied as in _rows_to_df(). Returns an empty DataFrame if the connection fails.
+    Raises mysql.connector.Error on database operation failure.
+    """
+    with db_cursor() as (connection, cursor):
+        if connection is None:
+            return pd.DataFrame()
+
+        try:
+            cursor.execute(query, params or ())
+            df = pd.DataFrame.from_records(cursor.fetchall(), columns=cursor.column_names)
+        except Error as e:
+            logger.error("Error executing query: %s", e)
+            raise e
+    return _apply_dtypes(df, dtypes)
+
+# Rows typed per chunk frame by stream_df()
+STREAM_DF_CHUNK_SIZE = 5000
+
+def stream_df(query, params=None, dtypes=None, size=STREAM_DF_CHUNK_SIZE):
+    """Like query_df(), for large reads: the result is read on an unbuffered cursor in
+    fetchmany(size) chunks, and each chunk is built and typed as it arrives, so only one
+    chunk of raw row tuples (with their Decimal objects) is held at a time.
+    Category columns are applied once after the chunk frames are concatenated, since
+    concatenating categoricals with different categories falls back to object.
+    Returns an empty DataFrame if the connection fails.
+    Raises mysql.connector.Error on database operation failure.
+    """
+    chunk_dtypes = {column: dtype for column, dtype in (dtypes or {}).items() if dtype != 'category'}
+    with db_connection() as connection:
+        if connection is None:
+            return pd.DataFrame()
+
+        cursor = connection.cursor(buffered=False)
+        try:
+            cursor.execute(query, params or ())
+            columns = cursor.column_names
+            chunks = []
+            while True:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                chunks.append(_apply_dtypes(pd.DataFrame.from_records(rows, columns=columns), chunk_dtypes))
+        except Error as e:
+            logger.error("Error streaming query: %s", e)
+            raise e
+        finally:
+            try:
+                cursor.close()
+            except Error:
+                # A failed read leaves unread rows behind; drain them before the connection is reused
+                connection.consume_results()
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+    return _apply_dtypes(df, dtypes)
+
+# Rows per executemany() call; keeps each multi-row INSERT well under max_allowed_packet
+BULK_CHUNK_SIZE = 1000
+
+def execute_many(query, params_list):
+    """Executes a write query once per params tuple inside a single transaction.
+    For INSERTs the connector batches each chunk of BULK_CHUNK_SIZE rows into one
+    multi-row statement.
+    Returns the number of affected rows, or None if the connection fails.
+    Raises mysql.connector.Error (after rolling back) if any row fails.
+    """
+    if not params_list:
+        return 0
+
+    with db_cursor() as (connection, cursor):
+        if connection is None:
+            return None
+
+        try:
+            connection.start_transaction()
+            affected = 0
+            for start in range(0, len(params_list), BULK_CHUNK_SIZE):
+                cursor.executemany(query, params_list[start:start + BULK_CHUNK_SIZE])
+                affected += cursor.rowcount
+            connection.commit()
+            return affected
+        except Error as e:
+            connection.rollback()
+            logger.error("Error executing batch query: %s", e)
+            raise e # Re-raise the exception for app.py to catch
+
+def execute_statements(statements):
+    """Executes several (query, params) write statements inside a single transaction.
+    Returns the total number of affected rows, or None if the connection fails.
+    Raises mysql.connector.Error (after rolling back) if any statement fails.
+    """
+    if not statements:
+        return 0
+
+    with db_cursor() as (connection, cursor):
+        if connection is None:
+            return None
+
+        try:
+            connection.start_transaction()
+            affected = 0
+            for query, params in statements:
+                cursor.execute(query, params)
+                affected += cursor.rowcount
+            connection.commit()
+            return affected
+        except Error as e:
+            connection.rollback()
+            logger.error("Error executing batch statements: %s", e)
+            raise e # Re-raise the exception for app.py to catch
+
+# mysql-connector-python 9.2 dropped execute(multi=True): a multi-statement batch there is
+# sent with a plain execute() and its results are walked with nextset()
+_LEGACY_MULTI = mysql.connector.__version_info__[:2] < (9, 2)
+
+def _execute_multi(cursor, batch, params=()):
+    """Sends a `;`-separated batch of statements in one round trip and yields the cursor once
+    per statement, positioned on that statement's result (rowcount, or fetchall() when
+    with_rows). Must be iterated to the end. Raises mysql.connector.Error at the failing
+    statement; the server does not run the statements after it."""
+    if _LEGACY_MULTI:
+        yield from cursor.execute(batch, params, multi=True)
+        return
+    cursor.execute(batch, params)
+    yield cursor
+    while cursor.nextset():
+        yield cursor
+
+def build_case_update(table, id_column, columns, rows):
+    """Builds one UPDATE that sets every column in `columns` for many rows at once:
+    `col = CASE id WHEN %s THEN %s ... END` per column, limited by `WHERE id IN (...)`.
+    `rows` is a list of (row_id, values) pairs with values in `columns` order.
+    Returns (query, params)."""
+    whens = " ".join(["WHEN %s THEN %s"] * len(rows))
+    set_clauses = []
+    params = []
+    for i, column in enumerate(columns):
+        set_clauses.append(f"{column} = CASE {id_column} {whens} END")
+        for row_id, values in rows:
+            params.extend((row_id, values[i]))
+    params.extend(row_id for row_id, _ in rows)
+    placeholders = ", ".join(["%s"] * len(rows))
+    query = f"UPDATE {table} SET {', '.join(set_clauses)} WHERE {id_column} IN ({placeholders})"
+    return query, tuple(params)
+
+def _case_update_statements(table, id_column, columns, rows):
+    """Splits `rows` into CASE-merged UPDATEs of at most BULK_CHUNK_SIZE rows each."""
+    return [build_case_update(table, id_column, columns, rows[start:start + BULK_CHUNK_SIZE])
+            for start in range(0, len(rows), BULK_CHUNK_SIZE)]
 
 # --- User Management ---
 def add_user(username, password, email=None, role='user'):
     """Adds a new user to the database with a specified role."""
-    query = "INSERT INTO users (username, password, email, role) VALUES (%s, %s, %s, %s)"
-    return execute_query(query, (username, password, email, role))
+    with _user_cache_lock:
+        _user_cache.pop(username, None)
+    return execute_query(SQL_ADD_USER, (username, password, email, role), op='insert')
 
 def get_user_by_username(username):
-    """Retrieves a user by username."""
-    query = "SELECT * FROM users WHERE username = %s"
-    return execute_query(query, (username,), fetch=True)
+    """Retrieves a user (as a dict) by username, or None.
+    Found users are served from the in-process cache for up to USER_CACHE_TTL seconds."""
+    with _user_cache_lock:
+        entry = _user_cache.get(username)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+
+    user = execute_query(SQL_GET_USER_BY_USERNAME, (username,), fetch_one=True)
+    if user:
+        with _user_cache_lock:
+            if username not in _user_cache and len(_user_cache) >= USER_CACHE_MAX_SIZE:
+                _user_cache.pop(next(iter(_user_cache)), None) # Evict the oldest entry
+            _user_cache[username] = (time.monotonic() + USER_CACHE_TTL, user)
+    return user
+
+def invalidate_user_cache(user_id):
+    """Drops cached lookups for the given user_id."""
+    with _user_cache_lock:
+        for username, (_, user) in list(_user_cache.items()):
+            if user['user_id'] == user_id:
+                _user_cache.pop(username, None)
 
 def get_user_by_id(user_id):
-    """Retrieves a user by ID."""
-    query = "SELECT * FROM users WHERE user_id = %s"
-    return execute_query(query, (user_id,), fetch=True)
+    """Retrieves a user (as a dict) by ID, or None."""
+    return execute_query(SQL_GET_USER_BY_ID, (user_id,), fetch_one=True)
 
+@cached()
 def get_user_role(user_id):
     """Retrieves the role of a user."""
-    query = "SELECT role FROM users WHERE user_id = %s"
-    result = execute_query(query, (user_id,), fetch=True)
-    return result[0]['role'] if result else None
+    row = execute_query(SQL_GET_USER_ROLE, (user_id,), fetch_one=True)
+    return row['role'] if row else None
+
+@cached()
+def get_username(user_id):
+    """Retrieves just the username of a user."""
+    row = execute_query(SQL_GET_USERNAME, (user_id,), fetch_one=True)
+    return row['username'] if row else None
 
 def get_all_users():
     """Retrieves all registered users."""
-    query = "SELECT user_id, username, email, role, created_at FROM users"
-    return execute_query(query, fetch=True)
+    return execute_query(SQL_GET_ALL_USERS, fetch=True)
+
+def get_all_users_df():
+    """Retrieves all registered users as a pandas DataFrame."""
+    return query_df(SQL_GET_ALL_USERS)
+
+# Child tables first: the foreign keys are ON DELETE RESTRICT
+USER_CASCADE_TABLES = ('transactions', 'investments', 'accounts', 'portfolios', 'users')
+
+# The transaction boundaries travel in the same batch, so BEGIN and COMMIT cost no extra round trips
+def _user_cascade_batch(user_count):
+    """Builds START TRANSACTION; one DELETE ... WHERE user_id IN (...) per USER_CASCADE_TABLES; COMMIT;"""
+    placeholders = ", ".join(["%s"] * user_count)
+    deletes = [f"DELETE FROM {table} WHERE user_id IN ({placeholders});" for table in USER_CASCADE_TABLES]
+    return " ".join(["START TRANSACTION;"] + deletes + ["COMMIT;"])
+
+SQL_DELETE_USER_CASCADE = _user_cascade_batch(1)
 
 def delete_user_and_all_data(user_id):
     """
@@ -92,63 +776,67 @@ def delete_user_and_all_data(user_id):
     Returns True on success, False on failure.
     Raises mysql.connector.Error if a database error occurs during any step.
     """
-    connection = None
-    try:
-        connection = create_connection()
+    return delete_users_and_all_data([user_id])
+
+def delete_users_and_all_data(user_ids):
+    """Same as delete_user_and_all_data, for several users in one transaction.
+    START TRANSACTION, the DELETEs and COMMIT go out as one multi-statement batch,
+    so the whole cascade costs a single round trip.
+    None ids are skipped; returns False if there is nothing to delete or the connection fails."""
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    if not user_ids:
+        return False
+    batch = SQL_DELETE_USER_CASCADE if len(user_ids) == 1 else _user_cascade_batch(len(user_ids))
+
+    with db_cursor() as (connection, cursor):
         if connection is None:
             return False
 
-        cursor = connection.cursor()
-        
-        # Start a transaction
-        connection.start_transaction()
-
-        # 1. Delete user's transactions
-        cursor.execute("DELETE FROM transactions WHERE user_id = %s", (user_id,))
-        print(f"Deleted {cursor.rowcount} transactions for user {user_id}")
-
-        # 2. Delete user's investments
-        cursor.execute("DELETE FROM investments WHERE user_id = %s", (user_id,))
-        print(f"Deleted {cursor.rowcount} investments for user {user_id}")
-
-        # 3. Delete user's accounts
-        cursor.execute("DELETE FROM accounts WHERE user_id = %s", (user_id,))
-        print(f"Deleted {cursor.rowcount} accounts for user {user_id}")
-
-        # 4. Delete user's portfolios
-        cursor.execute("DELETE FROM portfolios WHERE user_id = %s", (user_id,))
-        print(f"Deleted {cursor.rowcount} portfolios for user {user_id}")
-
-        # 5. Delete the user itself
-        cursor.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
-        print(f"Deleted {cursor.rowcount} user record for user {user_id}")
-        
-        connection.commit()
-        return True
-    except Error as e:
-        if connection:
+        try:
+            # Delete transactions, investments, accounts, portfolios and finally the users, in that order.
+            # If a DELETE fails the server skips the rest of the batch, COMMIT included,
+            # and the except below rolls back the open transaction.
+            params = tuple(user_ids) * len(USER_CASCADE_TABLES)
+            labels = (None,) + USER_CASCADE_TABLES + (None,) # Results of START TRANSACTION / COMMIT carry no rows
+            log_counts = logger.isEnabledFor(logging.DEBUG)
+            for table, result in zip(labels, _execute_multi(cursor, batch, params)):
+                if table and log_counts:
+                    logger.debug("Deleted %s %s rows for users %s", result.rowcount, table, user_ids)
+
+            for user_id in user_ids:
+                invalidate_user_cache(user_id)
+                invalidate_portfolio_summary(user_id)
+            invalidate_read_cache('get_user_role', 'get_username')
+            return True
+        except Error as e:
             connection.rollback() # Rollback on error
-        print(f"Error deleting user {user_id} and their data: {e}")
-        raise e # Re-raise the error for app.py to handle
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+            logger.error("Error deleting users %s and their data: %s", user_ids, e)
+            raise e # Re-raise the error for app.py to handle
 
 
 # --- Portfolio Management ---
 def add_portfolio(user_id, portfolio_name, description=None):
     """Adds a new portfolio for a user."""
-    query = "INSERT INTO portfolios (user_id, portfolio_name, description) VALUES (%s, %s, %s)"
-    return execute_query(query, (user_id, portfolio_name, description))
+    return execute_query(SQL_ADD_PORTFOLIO, (user_id, portfolio_name, description), op='insert')
 
 def get_portfolios_by_user(user_id):
     """Retrieves all portfolios for a given user."""
-    query = "SELECT * FROM portfolios WHERE user_id = %s"
-    return execute_query(query, (user_id,), fetch=True)
+    return execute_query(SQL_GET_PORTFOLIOS_BY_USER, (user_id,), fetch=True)
+
+def get_portfolios_by_names(user_id, names):
+    """Returns {portfolio_name: portfolio_id} for those of the user's portfolios named in `names`."""
+    return _ids_by_names('portfolios', 'portfolio_id', 'portfolio_name', names, user_id)
+
+# Prebuilt single-column UPDATEs for renaming a portfolio or editing just its description
+SQL_UPDATE_PORTFOLIO_COLUMN = {column: f"UPDATE portfolios SET {column} = %s WHERE portfolio_id = %s" for column in ('portfolio_name', 'description')}
 
 def update_portfolio(portfolio_id, portfolio_name=None, description=None):
     """Updates an existing portfolio."""
+    if portfolio_name is None and description is not None:
+        return execute_query(SQL_UPDATE_PORTFOLIO_COLUMN['description'], (description, portfolio_id), op='update')
+    if description is None and portfolio_name is not None:
+        return execute_query(SQL_UPDATE_PORTFOLIO_COLUMN['portfolio_name'], (portfolio_name, portfolio_id), op='update')
+
     updates = []
     params = []
     if portfolio_name is not None:
@@ -163,357 +851,539 @@ def update_portfolio(portfolio_id, portfolio_name=None, description=None):
 
     query = f"UPDATE portfolios SET {', '.join(updates)} WHERE portfolio_id = %s"
     params.append(portfolio_id)
-    return execute_query(query, tuple(params))
+    return execute_query(query, tuple(params), op='update')
+
+def update_portfolios_bulk(portfolios):
+    """Updates several portfolios in one transaction.
+    `portfolios` is a list of (portfolio_id, portfolio_name, description) tuples."""
+    rows = [(portfolio_id, (name, description)) for portfolio_id, name, description in portfolios]
+    return execute_statements(_case_update_statements('portfolios', 'portfolio_id', ('portfolio_name', 'description'), rows))
 
 def delete_portfolio(portfolio_id):
     """Deletes a portfolio by its ID."""
-    query = "DELETE FROM portfolios WHERE portfolio_id = %s"
-    return execute_query(query, (portfolio_id,))
+    result = execute_query(SQL_DELETE_PORTFOLIO, (portfolio_id,), op='delete')
+    invalidate_portfolio_summary()
+    return result
 
 # --- Account Management ---
 def add_account(user_id, account_name, account_type, initial_balance=0.00, currency='USD'):
     """Adds a new account for a user."""
-    query = "INSERT INTO accounts (user_id, account_name, account_type, current_balance, currency) VALUES (%s, %s, %s, %s, %s)"
-    return execute_query(query, (user_id, account_name, account_type, initial_balance, currency))
+    result = execute_query(SQL_ADD_ACCOUNT, (user_id, account_name, account_type, initial_balance, currency), op='insert')
+    invalidate_portfolio_summary(user_id)
+    return result
+
+def add_accounts_bulk(user_id, accounts):
+    """Adds several accounts for a user in one round trip.
+    `accounts` is a list of (account_name, account_type, initial_balance, currency) tuples."""
+    result = execute_many(SQL_ADD_ACCOUNT, [(user_id, *account) for account in accounts])
+    invalidate_portfolio_summary(user_id)
+    return result
 
 def get_accounts_by_user(user_id):
     """Retrieves all accounts for a given user."""
-    query = "SELECT * FROM accounts WHERE user_id = %s"
-    return execute_query(query, (user_id,), fetch=True)
+    return execute_query(SQL_GET_ACCOUNTS_BY_USER, (user_id,), fetch=True)
 
-def get_all_accounts():
-    """Retrieves account balances of all users."""
-    query = "SELECT a.*, u.username FROM accounts a JOIN users u ON a.user_id = u.user_id"
+def get_all_accounts(fields=None):
+    """Retrieves account balances of all users.
+    If fields is given, only those columns (keys of ALL_ACCOUNTS_COLUMNS) are selected."""
+    query = select_columns(ALL_ACCOUNTS_COLUMNS, SQL_ALL_ACCOUNTS_FROM, fields) if fields else SQL_GET_ALL_ACCOUNTS
     return execute_query(query, fetch=True)
 
 def update_account_balance(account_id, new_balance):
     """Updates the current balance of an account."""
-    query = "UPDATE accounts SET current_balance = %s WHERE account_id = %s"
-    return execute_query(query, (new_balance, account_id))
+    result = execute_query(SQL_UPDATE_ACCOUNT_BALANCE, (new_balance, account_id), op='update')
+    invalidate_portfolio_summary()
+    return result
+
+def update_account_balances_bulk(balances):
+    """Updates several account balances in one transaction.
+    `balances` is a list of (account_id, new_balance) tuples."""
+    rows = [(account_id, (new_balance,)) for account_id, new_balance in balances]
+    result = execute_statements(_case_update_statements('accounts', 'account_id', ('current_balance',), rows))
+    invalidate_portfolio_summary()
+    return result
 
 def delete_account(account_id):
     """Deletes an account by its ID."""
-    query = "DELETE FROM accounts WHERE account_id = %s"
-    return execute_query(query, (account_id,))
+    result = execute_query(SQL_DELETE_ACCOUNT, (account_id,), op='delete')
+    invalidate_portfolio_summary()
+    return result
 
 # --- Asset Type Management (Categories like Stock, Crypto) ---
+@cached()
 def get_asset_types():
     """Retrieves all available asset types (categories)."""
-    query = "SELECT * FROM asset_types ORDER BY type_name"
-    return execute_query(query, fetch=True)
+    return execute_query(SQL_GET_ASSET_TYPES, fetch=True)
+
+def get_asset_types_by_names(names):
+    """Returns {type_name: asset_type_id} for the asset types named in `names`."""
+    return _ids_by_names('asset_types', 'asset_type_id', 'type_name', names)
 
 def add_asset_type(type_name, description=None):
     """Adds a new asset type (category)."""
-    query = "INSERT INTO asset_types (type_name, description) VALUES (%s, %s)"
-    return execute_query(query, (type_name, description))
+    result = execute_query(SQL_ADD_ASSET_TYPE, (type_name, description), op='insert')
+    invalidate_reference_cache()
+    return result
 
 # --- Asset Management (Specific assets like Gold, Bitcoin) ---
 def add_asset(name, unit_price, unit_type):
     """Adds a new pre-defined asset."""
-    query = "INSERT INTO assets (name, unit_price, unit_type) VALUES (%s, %s, %s)"
-    return execute_query(query, (name, unit_price, unit_type))
+    result = execute_query(SQL_ADD_ASSET, (name, unit_price, unit_type), op='insert')
+    invalidate_reference_cache()
+    return result
 
+@cached()
 def get_all_assets():
     """Retrieves all pre-defined assets."""
-    query = "SELECT * FROM assets ORDER BY name"
-    return execute_query(query, fetch=True)
-
+    return execute_query(SQL_GET_ALL_ASSETS, fetch=True)
+
+def get_assets_by_names(names):
+    """Returns {name: asset_id} for the assets named in `names`."""
+    return _ids_by_names('assets', 'asset_id', 'name', names)
+
+def delete_by_ids(table, id_column, ids):
+    """Deletes several rows of `table` in one `DELETE ... WHERE id_column IN (...)` statement.
+    `table` and `id_column` must come from code, never from user input. None ids are skipped.
+    Drops the cached reads that may still hold the deleted rows.
+    Returns True if any rows were deleted."""
+    ids = [row_id for row_id in ids if row_id is not None]
+    if not ids:
+        return False
+    placeholders = ", ".join(["%s"] * len(ids))
+    result = execute_query(f"DELETE FROM {table} WHERE {id_column} IN ({placeholders})", tuple(ids), op='delete')
+    if table in ('assets', 'asset_types'):
+        invalidate_reference_cache()
+    if table in ('accounts', 'investments', 'assets'):
+        invalidate_portfolio_summary()
+    return result
+
+def _ids_by_names(table, id_column, name_column, names, user_id=None):
+    """Looks up the ids of several rows by name in one `WHERE name IN (...)` query.
+    Names with no matching row are left out of the returned dict."""
+    if not names:
+        return {}
+    placeholders = ", ".join(["%s"] * len(names))
+    query = f"SELECT {name_column}, {id_column} FROM {table} WHERE {name_column} IN ({placeholders})"
+    params = list(names)
+    if user_id is not None:
+        query += " AND user_id = %s"
+        params.append(user_id)
+    rows = execute_query(query, tuple(params), fetch=True) or []
+    return {row[name_column]: row[id_column] for row in rows}
+
+@cached()
 def get_asset_by_id(asset_id):
     """Retrieves a specific asset by its ID."""
-    query = "SELECT * FROM assets WHERE asset_id = %s"
-    result = execute_query(query, (asset_id,), fetch=True)
-    return result[0] if result else None
+    return execute_query(SQL_GET_ASSET_BY_ID, (asset_id,), fetch_one=True)
+
+@cached()
+def get_asset_price(asset_id):
+    """Retrieves just the current unit price of an asset."""
+    row = execute_query(SQL_GET_ASSET_PRICE, (asset_id,), fetch_one=True)
+    return row['unit_price'] if row else None
 
 def update_asset_price(asset_id, new_unit_price):
     """Updates the unit price of an asset."""
-    query = "UPDATE assets SET unit_price = %s WHERE asset_id = %s"
-    return execute_query(query, (new_unit_price, asset_id))
+    result = execute_query(SQL_UPDATE_ASSET_PRICE, (new_unit_price, asset_id), op='update')
+    invalidate_reference_cache()
+    invalidate_portfolio_summary() # Every holder's investment value moves with the price
+    return result
 
 # --- Investment Management (User's holdings of assets) ---
 def add_investment(user_id, portfolio_id, asset_category_id, asset_id, investment_name, symbol, initial_investment_amount, purchase_date, quantity, currency='USD', notes=None):
     """Adds a new investment for a user, linked to a specific asset."""
-    query = """
-    INSERT INTO investments (user_id, portfolio_id, asset_category_id, asset_id, investment_name, symbol, initial_investment_amount, purchase_date, quantity, currency, notes)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    """
     params = (user_id, portfolio_id, asset_category_id, asset_id, investment_name, symbol, initial_investment_amount, purchase_date, quantity, currency, notes)
-    return execute_query(query, params)
+    result = execute_query(SQL_ADD_INVESTMENT, params, op='insert')
+    invalidate_portfolio_summary(user_id)
+    return result
+
+def add_investments_bulk(user_id, investments):
+    """Adds several investments for a user in one round trip.
+    Each entry in `investments` is a tuple of the add_investment() arguments after user_id,
+    with currency and notes included."""
+    result = execute_many(SQL_ADD_INVESTMENT, [(user_id, *investment) for investment in investments])
+    invalidate_portfolio_summary(user_id)
+    return result
 
 def get_investments_by_user(user_id):
     """Retrieves all investments for a given user, including portfolio, asset category, and current asset price."""
-    query = """
-    SELECT
-        i.investment_id,
-        i.user_id,
-        i.portfolio_id,
-        p.portfolio_name,
-        i.asset_category_id,
-        at.type_name AS asset_category_name,
-        i.asset_id,
-        a.name AS asset_name,
-        a.unit_price AS current_unit_price, -- Get current price from assets table
-        a.unit_type,
-        i.investment_name,
-        i.symbol,
-        i.initial_investment_amount,
-        i.purchase_date,
-        i.quantity,
-        (i.quantity * a.unit_price) AS current_value, -- Dynamically calculate current_value
-        i.currency,
-        i.notes
-    FROM investments i
-    JOIN portfolios p ON i.portfolio_id = p.portfolio_id
-    JOIN asset_types at ON i.asset_category_id = at.asset_type_id
-    JOIN assets a ON i.asset_id = a.asset_id
-    WHERE i.user_id = %s
-    """
-    return execute_query(query, (user_id,), fetch=True)
-
-def get_all_investments_detailed():
-    """Retrieves all investments for all users, with detailed asset info and dynamic value."""
-    query = """
-    SELECT
-        i.investment_id,
-        i.user_id,
-        u.username,
-        i.portfolio_id,
-        p.portfolio_name,
-        i.asset_category_id,
-        at.type_name AS asset_category_name,
-        i.asset_id,
-        a.name AS asset_name,
-        a.unit_price AS current_unit_price,
-        a.unit_type,
-        i.investment_name,
-        i.symbol,
-        i.initial_investment_amount,
-        i.purchase_date,
-        i.quantity,
-        (i.quantity * a.unit_price) AS current_value,
-        i.currency,
-        i.notes
-    FROM investments i
-    JOIN users u ON i.user_id = u.user_id
-    JOIN portfolios p ON i.portfolio_id = p.portfolio_id
-    JOIN asset_types at ON i.asset_category_id = at.asset_type_id
-    JOIN assets a ON i.asset_id = a.asset_id
-    ORDER BY u.username, p.portfolio_name, i.investment_name
-    """
-    return execute_query(query, fetch=True)
-
+    return execute_query(SQL_GET_INVESTMENTS_BY_USER, (user_id,), fetch=True)
+
+def get_investment_by_user_and_asset(user_id, asset_id):
+    """Retrieves a user's existing investment in a specific asset, or None.
+    Served by the (user_id, asset_id) index on investments."""
+    return execute_query(SQL_GET_INVESTMENT_BY_USER_AND_ASSET, (user_id, asset_id), fetch_one=True)
+
+def get_all_investments_detailed(fields=None, limit=None, offset=0):
+    """Retrieves all investments for all users, with detailed asset info and dynamic value.
+    If fields is given, only those columns (keys of ALL_INVESTMENTS_COLUMNS) are selected.
+    If limit is given, only that page of rows (starting at offset) is returned."""
+    query, params = _all_investments_query(fields, limit, offset)
+    return execute_query(query, params, fetch=True)
+
+def stream_all_investments_detailed(fields=None, limit=None, offset=0):
+    """Same as get_all_investments_detailed, but yields rows as they stream from the server."""
+    query, params = _all_investments_query(fields, limit, offset)
+    return stream_query(query, params)
+
+def _all_investments_query(fields, limit, offset):
+    query = select_columns(ALL_INVESTMENTS_COLUMNS, SQL_ALL_INVESTMENTS_FROM, fields) if fields else SQL_GET_ALL_INVESTMENTS_DETAILED
+    return paginate(query, limit, offset)
+
+def count_all_investments():
+    """Returns the number of investments across all users."""
+    result = execute_query("SELECT COUNT(*) AS total FROM investments", fetch=True)
+    return result[0]['total'] if result else 0
+
+
+# Columns update_investment() / update_investments_bulk() may set, in the order they appear in the generated UPDATE.
+# current_value is dynamically calculated, so it's not updated directly
+INVESTMENT_UPDATE_COLUMNS = ('investment_name', 'symbol', 'initial_investment_amount', 'purchase_date', 'quantity',
+                             'currency', 'notes', 'portfolio_id', 'asset_category_id', 'asset_id')
+# Prebuilt single-column UPDATEs for the common one-field edits
+SQL_UPDATE_INVESTMENT_COLUMN = {column: f"UPDATE investments SET {column} = %s WHERE investment_id = %s" for column in INVESTMENT_UPDATE_COLUMNS}
 
 def update_investment(investment_id, investment_name=None, symbol=None, initial_investment_amount=None, purchase_date=None, quantity=None, currency=None, notes=None, portfolio_id=None, asset_category_id=None, asset_id=None):
-    """Updates an existing investment."""
-    updates = []
-    params = []
-    if investment_name is not None:
-        updates.append("investment_name = %s")
-        params.append(investment_name)
-    if symbol is not None:
-        updates.append("symbol = %s")
-        params.append(symbol)
-    if initial_investment_amount is not None:
-        updates.append("initial_investment_amount = %s")
-        params.append(initial_investment_amount)
-    if purchase_date is not None:
-        updates.append("purchase_date = %s")
-        params.append(purchase_date)
-    if quantity is not None:
-        updates.append("quantity = %s")
-        params.append(quantity)
-    # current_value is now dynamically calculated, so it's not updated directly
-    if currency is not None:
-        updates.append("currency = %s")
-        params.append(currency)
-    if notes is not None:
-        updates.append("notes = %s")
-        params.append(notes)
-    if portfolio_id is not None:
-        updates.append("portfolio_id = %s")
-        params.append(portfolio_id)
-    if asset_category_id is not None:
-        updates.append("asset_category_id = %s")
-        params.append(asset_category_id)
-    if asset_id is not None:
-        updates.append("asset_id = %s")
-        params.append(asset_id)
+    """Updates an existing investment, setting only the columns that are not None."""
+    values = (investment_name, symbol, initial_investment_amount, purchase_date, quantity, currency, notes, portfolio_id, asset_category_id, asset_id)
+    updates = [(column, value) for column, value in zip(INVESTMENT_UPDATE_COLUMNS, values) if value is not None]
 
     if not updates:
         return False
-
-    query = f"UPDATE investments SET {', '.join(updates)} WHERE investment_id = %s"
-    params.append(investment_id)
-    return execute_query(query, tuple(params))
+    if len(updates) == 1:
+        column, value = updates[0]
+        result = execute_query(SQL_UPDATE_INVESTMENT_COLUMN[column], (value, investment_id), op='update')
+    else:
+        query = f"UPDATE investments SET {', '.join(f'{column} = %s' for column, _ in updates)} WHERE investment_id = %s"
+        result = execute_query(query, tuple(value for _, value in updates) + (investment_id,), op='update')
+    invalidate_portfolio_summary()
+    return result
+
+def update_investments_bulk(changes):
+    """Updates many investments in one transaction.
+    `changes` is a list of dicts holding 'investment_id' plus the columns to set
+    (any of INVESTMENT_UPDATE_COLUMNS). Changes touching the same set of columns are
+    merged into a single CASE-based UPDATE.
+    Returns the number of affected rows, or None if the connection fails."""
+    groups = {}
+    for change in changes:
+        columns = tuple(column for column in INVESTMENT_UPDATE_COLUMNS if column in change)
+        if columns:
+            groups.setdefault(columns, []).append((change['investment_id'], [change[column] for column in columns]))
+    statements = []
+    for columns, rows in groups.items():
+        statements.extend(_case_update_statements('investments', 'investment_id', columns, rows))
+    result = execute_statements(statements)
+    invalidate_portfolio_summary()
+    return result
 
 def delete_investment(investment_id):
     """Deletes an investment by its ID."""
-    query = "DELETE FROM investments WHERE investment_id = %s"
-    return execute_query(query, (investment_id,))
+    result = execute_query(SQL_DELETE_INVESTMENT, (investment_id,), op='delete')
+    invalidate_portfolio_summary()
+    return result
 
 # --- Transaction Management ---
 def add_transaction(user_id, account_id=None, investment_id=None, asset_id=None, transaction_type=None, amount=None, quantity=None, unit_price_at_transaction=None, description=None):
     """Adds a new transaction, supporting both account-based and asset-based transactions."""
-    query = """
-    INSERT INTO transactions (user_id, account_id, investment_id, asset_id, transaction_type, amount, quantity, unit_price_at_transaction, description)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-    """
     params = (user_id, account_id, investment_id, asset_id, transaction_type, amount, quantity, unit_price_at_transaction, description)
-    return execute_query(query, params)
+    return execute_query(SQL_ADD_TRANSACTION, params, op='insert')
+
+def add_transactions_bulk(user_id, transactions):
+    """Adds several transactions for a user in one round trip.
+    Each entry in `transactions` is a tuple of all the add_transaction() arguments after user_id."""
+    return execute_many(SQL_ADD_TRANSACTION, [(user_id, *transaction) for transaction in transactions])
 
 def get_transactions_by_user(user_id):
     """Retrieves all transactions for a given user, including account, investment, and asset names."""
-    query = """
-    SELECT
-        t.transaction_id,
-        t.user_id,
-        t.account_id,
-        a.account_name,
-        t.investment_id,
-        i.investment_name,
-        t.asset_id,
-        ast.name AS asset_name, -- Alias for asset name from assets table
-        t.transaction_type,
-        t.amount,
-        t.quantity,
-        t.unit_price_at_transaction,
-        t.description,
-        t.transaction_date
-    FROM transactions t
-    LEFT JOIN accounts a ON t.account_id = a.account_id
-    LEFT JOIN investments i ON t.investment_id = i.investment_id
-    LEFT JOIN assets ast ON t.asset_id = ast.asset_id -- Join with assets table
-    WHERE t.user_id = %s
-    ORDER BY t.transaction_date DESC
-    """
-    return execute_query(query, (user_id,), fetch=True)
+    return execute_query(SQL_GET_TRANSACTIONS_BY_USER, (user_id,), fetch=True)
 
-def get_all_transactions_detailed():
-    """Retrieves full transaction history for all users, all assets."""
-    query = """
-    SELECT
-        t.transaction_id,
-        t.user_id,
-        u.username,
-        t.account_id,
-        a.account_name,
-        t.investment_id,
-        i.investment_name,
-        t.asset_id,
-        ast.name AS asset_name,
-        t.transaction_type,
-        t.amount,
-        t.quantity,
-        t.unit_price_at_transaction,
-        t.description,
-        t.transaction_date
-    FROM transactions t
-    JOIN users u ON t.user_id = u.user_id
-    LEFT JOIN accounts a ON t.account_id = a.account_id
-    LEFT JOIN investments i ON t.investment_id = i.investment_id
-    LEFT JOIN assets ast ON t.asset_id = ast.asset_id
-    ORDER BY t.transaction_date DESC, u.username
-    """
-    return execute_query(query, fetch=True)
+def iter_transactions_by_user(user_id):
+    """Same as get_transactions_by_user, but yields rows as they stream from the server."""
+    return stream_query(SQL_GET_TRANSACTIONS_BY_USER, (user_id,))
+
+def get_all_transactions_detailed(fields=None, limit=None, offset=0):
+    """Retrieves full transaction history for all users, all assets.
+    If fields is given, only those columns (keys of ALL_TRANSACTIONS_COLUMNS) are selected.
+    If limit is given, only that page of rows (starting at offset) is returned."""
+    query, params = _all_transactions_query(fields, limit, offset)
+    return execute_query(query, params, fetch=True)
+
+def stream_all_transactions_detailed(fields=None, limit=None, offset=0):
+    """Same as get_all_transactions_detailed, but yields rows as they stream from the server."""
+    query, params = _all_transactions_query(fields, limit, offset)
+    return stream_query(query, params)
+
+def _all_transactions_query(fields, limit, offset):
+    query = select_columns(ALL_TRANSACTIONS_COLUMNS, SQL_ALL_TRANSACTIONS_FROM, fields) if fields else SQL_GET_ALL_TRANSACTIONS_DETAILED
+    return paginate(query, limit, offset)
+
+def count_all_transactions():
+    """Returns the number of transactions across all users."""
+    result = execute_query("SELECT COUNT(*) AS total FROM transactions", fetch=True)
+    return result[0]['total'] if result else 0
 
 
 def delete_transaction(transaction_id):
     """Deletes a transaction by its ID."""
-    query = "DELETE FROM transactions WHERE transaction_id = %s"
-    return execute_query(query, (transaction_id,))
+    return execute_query(SQL_DELETE_TRANSACTION, (transaction_id,), op='delete')
+
+# --- Purchases ---
+def execute_purchase(user_id, account_id, new_balance, investment, transaction):
+    """
+    Records an asset purchase in a single database transaction:
+    sets the paying account's new balance, updates or inserts the investment, and logs the transaction.
+    `investment` is either {'investment_id', 'quantity'} to update an existing holding,
+    or the add_investment() fields (minus user_id) for a new one.
+    `transaction` holds the add_transaction() fields (minus user_id).
+    Returns the new transaction_id, or None if the connection fails.
+    Raises mysql.connector.Error (after rolling back) if any step fails.
+    """
+    with db_cursor() as (connection, cursor):
+        if connection is None:
+            return None
+
+        try:
+            connection.start_transaction()
+
+            # 1. Debit the paying account
+            cursor.execute(SQL_UPDATE_ACCOUNT_BALANCE, (new_balance, account_id))
+            if cursor.rowcount == 0:
+                raise Error(msg=f"Account {account_id} not found.")
+
+            # 2. Top up the existing holding or add a new investment
+            if 'investment_id' in investment:
+                cursor.execute(SQL_UPDATE_INVESTMENT_COLUMN['quantity'],
+                               (investment['quantity'], investment['investment_id']))
+            else:
+                cursor.execute(SQL_ADD_INVESTMENT, (
+                    user_id, investment['portfolio_id'], investment['asset_category_id'], investment['asset_id'],
+                    investment['investment_name'], investment.get('symbol'), investment['initial_investment_amount'],
+                    investment['purchase_date'], investment['quantity'], investment.get('currency', 'USD'), investment.get('notes')
+                ))
+
+            # 3. Log the transaction
+            cursor.execute(SQL_ADD_TRANSACTION, (
+                user_id, transaction.get('account_id'), transaction.get('investment_id'), transaction.get('asset_id'),
+                transaction.get('transaction_type'), transaction.get('amount'), transaction.get('quantity'),
+                transaction.get('unit_price_at_transaction'), transaction.get('description')
+            ))
+            transaction_id = cursor.lastrowid
+
+            connection.commit()
+            invalidate_portfolio_summary(user_id)
+            return transaction_id
+        except Error as e:
+            connection.rollback() # Rollback on error
+            logger.error("Error recording purchase for user %s: %s", user_id, e)
+            raise e # Re-raise the error for app.py to handle
 
 # --- Dashboard Data Retrieval ---
+@cached(SUMMARY_CACHE_TTL, copy=True)
 def get_portfolio_summary(user_id):
-    """Retrieves a summary of the user's portfolio, dynamically calculating investment value."""
-    summary = {}
-
-    # Total Account Balance
-    account_balances = execute_query(
-        "SELECT SUM(current_balance) AS total_balance FROM accounts WHERE user_id = %s",
-        (user_id,), fetch=True
-    )
-    summary['total_account_balance'] = account_balances[0]['total_balance'] if account_balances and account_balances[0]['total_balance'] is not None else Decimal('0.00')
-
-    # Total Investment Value (dynamically calculated)
-    # Summing (quantity * current_unit_price) for all investments of the user
-    investment_values = execute_query(
-        """
-        SELECT SUM(i.quantity * a.unit_price) AS total_investment_value
-        FROM investments i
-        JOIN assets a ON i.asset_id = a.asset_id
-        WHERE i.user_id = %s
-        """,
-        (user_id,), fetch=True
-    )
-    summary['total_investment_value'] = investment_values[0]['total_investment_value'] if investment_values and investment_values[0]['total_investment_value'] is not None else Decimal('0.00')
-
+    """Retrieves a summary of the user's portfolio, dynamically calculating investment value
+    (quantity * current unit price) in the same query as the account balance total.
+    Cached per user for SUMMARY_CACHE_TTL seconds (this is the read preload_dashboard() uses);
+    account, investment and price writers drop it. Returns None if the connection fails."""
+    result = execute_query(SQL_GET_PORTFOLIO_SUMMARY, (user_id, user_id), fetch=True)
+    if result is None:
+        return None
+    return _build_portfolio_summary(result)
+
+def get_portfolio_values(user_id):
+    """Retrieves each of the user's portfolios with its investment count and current value
+    (sum of quantity * current unit price), grouped in SQL."""
+    return execute_query(SQL_GET_PORTFOLIO_VALUES, (user_id,), fetch=True)
+
+def _build_portfolio_summary(rows):
+    """Builds the portfolio summary dict from the SQL_GET_PORTFOLIO_SUMMARY result."""
+    if not rows:
+        return {'total_account_balance': Decimal('0.00'), 'total_investment_value': Decimal('0.00'), 'total_portfolio_value': Decimal('0.00')}
+    summary = dict(rows[0])
     summary['total_portfolio_value'] = summary['total_account_balance'] + summary['total_investment_value']
-
     return summary
 
-def get_account_balances_df(user_id=None):
+def get_account_balances_df(user_id=None, fields=None):
     """Retrieves account balances as a pandas DataFrame.
-    If user_id is None, retrieves for all users (for admin)."""
-    if user_id:
-        accounts = get_accounts_by_user(user_id)
-    else:
-        accounts = get_all_accounts() # New function for admin view
-    if accounts:
-        return pd.DataFrame(accounts)
-    return pd.DataFrame()
-
-def get_investments_df(user_id=None):
+    If user_id is None, retrieves for all users (for admin); `fields` then limits
+    the selected columns to the ones the view displays."""
+    if not user_id:
+        # The admin table is display-only, so balances can drop to float64 there
+        return _rows_to_df(get_all_accounts(fields), ADMIN_ACCOUNT_DTYPES)
+    return query_df(SQL_GET_ACCOUNTS_BY_USER, (user_id,))
+
+def get_investments_df(user_id=None, fields=None, limit=None, offset=0):
     """Retrieves investments as a pandas DataFrame.
-    If user_id is None, retrieves for all users (for admin)."""
-    if user_id:
-        investments = get_investments_by_user(user_id)
-    else:
-        investments = get_all_investments_detailed() # New function for admin view
-    if investments:
-        return pd.DataFrame(investments)
-    return pd.DataFrame()
-
-def get_transactions_df(user_id=None):
-    """Retrieves transactions as a pandas DataFrame.
-    If user_id is None, retrieves for all users (for admin)."""
-    if user_id:
-        transactions = get_transactions_by_user(user_id)
-    else:
-        transactions = get_all_transactions_detailed() # New function for admin view
-    if transactions:
-        return pd.DataFrame(transactions)
-    return pd.DataFrame()
+    If user_id is None, retrieves for all users (for admin); `fields` then limits
+    the selected columns to the ones the view displays, and limit/offset select one page."""
+    if not user_id:
+        # Admin view: built chunk by chunk from an unbuffered read
+        return stream_df(*_all_investments_query(fields, limit, offset), INVESTMENT_DTYPES)
+    return query_df(SQL_GET_INVESTMENTS_BY_USER, (user_id,), INVESTMENT_DTYPES)
+
+def get_transactions_df(user_id=None, fields=None, limit=None, offset=0):
+    """Retrieves transactions as a pandas DataFrame, newest first (sorted in SQL).
+    If user_id is None, retrieves for all users (for admin); `fields` then limits
+    the selected columns to the ones the view displays, and limit/offset select one page."""
+    if not user_id:
+        # Admin view: built chunk by chunk from an unbuffered read
+        return stream_df(*_all_transactions_query(fields, limit, offset), TRANSACTION_DTYPES)
+    return query_df(SQL_GET_TRANSACTIONS_BY_USER, (user_id,), TRANSACTION_DTYPES)
 
 def get_portfolios_df(user_id=None):
     """Retrieves portfolios as a pandas DataFrame.
     If user_id is None, retrieves for all users (for admin)."""
-    if user_id:
-        portfolios = get_portfolios_by_user(user_id)
-    else:
-        # For admin, you might want a view of all portfolios or portfolios by user
-        # For now, let's keep it user-specific for the main dashboard,
-        # and admin will view investments directly.
-        # If a full 'all portfolios' view is needed, implement get_all_portfolios()
-        portfolios = get_portfolios_by_user(user_id) # Default to user-specific for now
-    if portfolios:
-        return pd.DataFrame(portfolios)
-    return pd.DataFrame()
-
+    # For admin, you might want a view of all portfolios or portfolios by user
+    # For now, let's keep it user-specific for the main dashboard,
+    # and admin will view investments directly.
+    # If a full 'all portfolios' view is needed, implement get_all_portfolios()
+    return query_df(SQL_GET_PORTFOLIOS_BY_USER, (user_id,))
+
+def get_portfolio_investments_df(user_id):
+    """Retrieves a user's portfolios joined with their investments, assets and asset types
+    as one pandas DataFrame, so callers don't have to merge three frames themselves."""
+    return query_df(SQL_GET_PORTFOLIO_INVESTMENTS, (user_id,), dtypes=INVESTMENT_DTYPES)
+
+@cached(REFERENCE_CACHE_TTL, copy=True)
 def get_asset_types_df():
     """Retrieves asset types as a pandas DataFrame."""
-    asset_types = get_asset_types()
-    if asset_types:
-        return pd.DataFrame(asset_types)
-    return pd.DataFrame()
-
-def get_assets_df():
-    """Retrieves all assets as a pandas DataFrame."""
-    assets = get_all_assets()
-    if assets:
-        return pd.DataFrame(assets)
-    return pd.DataFrame()
+    return _rows_to_df(get_asset_types())
+
+@cached(REFERENCE_CACHE_TTL, copy=True)
+def get_assets_df(columns=None):
+    """Retrieves all assets as a pandas DataFrame.
+    If columns is given, only those asset columns are selected (e.g. ASSET_LIST_COLUMNS)."""
+    if columns:
+        invalid = set(columns) - set(ASSET_LIST_COLUMNS)
+        if invalid:
+            raise ValueError(f"Unsupported asset columns: {sorted(invalid)}")
+        return query_df(f"SELECT {', '.join(columns)} FROM assets ORDER BY name")
+    return _rows_to_df(get_all_assets())
+
+# Dashboard reads run concurrently, each on its own pooled connection. The executor is
+# shared by every session and sized below pool_size, so it can never take the whole pool.
+DASHBOARD_WORKERS = max(1, min(4, POOL_CONFIG['pool_size'] - 1))
+_dashboard_executor = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix='wms-dashboard')
+
+def run_concurrently(calls):
+    """Runs independent read calls, given as (func, *args) tuples, on the dashboard thread
+    pool and returns their results in the same order. A single call runs inline.
+    Re-raises the first exception raised by any call."""
+    if len(calls) == 1:
+        func, *args = calls[0]
+        return [func(*args)]
+    futures = [_dashboard_executor.submit(func, *args) for func, *args in calls]
+    return [future.result() for future in futures]
+
+def preload_dashboard(user_id, role, include_reference=True):
+    """Loads every DataFrame the dashboard needs for a user.
+    Runs the same queries as the individual get_*_df helpers, but submits them all to
+    the dashboard thread pool at once, so the page waits for the slowest query rather
+    than their sum.
+    With include_reference=False the shared asset_types/assets tables are skipped,
+    for callers that cache those separately.
+    Returns a dict keyed by the session_state names used in app.py, or None if
+    a connection can't be obtained. Raises mysql.connector.Error on query failure.
+    """
+    queries = {
+        'accounts_df': (SQL_GET_ACCOUNTS_BY_USER, (user_id,)),
+        'portfolios_df': (SQL_GET_PORTFOLIOS_BY_USER, (user_id,)),
+    }
+    if include_reference:
+        queries['asset_types_df'] = (SQL_GET_ASSET_TYPES, ())
+        queries['assets_df'] = (SQL_GET_ASSET_LIST, ())
+    # Admin's system-wide all_* tables are loaded on demand by the app, not here
+    if role != 'admin':
+        queries['investments_df'] = (SQL_GET_INVESTMENTS_BY_USER, (user_id,))
+        queries['transactions_df'] = (SQL_GET_TRANSACTIONS_BY_USER, (user_id,))
+
+    dtypes = {'investments_df': INVESTMENT_DTYPES, 'transactions_df': TRANSACTION_DTYPES}
+    futures = {key: _dashboard_executor.submit(query_df, query, params, dtypes.get(key))
+               for key, (query, params) in queries.items()}
+    # The summary goes through the cached reader, so repeat loads within SUMMARY_CACHE_TTL skip the query
+    if role != 'admin':
+        futures['portfolio_summary'] = _dashboard_executor.submit(get_portfolio_summary, user_id)
+    data = {}
+    try:
+        for key, future in futures.items():
+            result = future.result()
+            if key == 'portfolio_summary' and result is None:
+                return None # No connection could be obtained
+            data[key] = result
+        return data
+    except Error as e:
+        logger.error("Error preloading dashboard for user %s: %s", user_id, e)
+        raise e
+
+# The full per-user snapshot fetched by get_all_user_dataframes(): (key, query binding user_id)
+USER_SNAPSHOT_QUERIES = (
+    ('accounts_df', SQL_GET_ACCOUNTS_BY_USER),
+    ('investments_df', SQL_GET_INVESTMENTS_BY_USER),
+    ('transactions_df', SQL_GET_TRANSACTIONS_BY_USER),
+    ('portfolio_investments_df', SQL_GET_PORTFOLIO_INVESTMENTS),
+)
+SQL_GET_USER_SNAPSHOT = ";\n".join(query.strip() for _, query in USER_SNAPSHOT_QUERIES) + ";\n" + SQL_GET_PORTFOLIO_SUMMARY.strip()
+
+def get_all_user_dataframes(user_id):
+    """Fetches every user DataFrame plus the portfolio summary in one multi-statement round trip.
+    Returns a dict keyed like preload_dashboard() ('accounts_df', ..., 'portfolio_summary'),
+    or None if the connection fails. Raises mysql.connector.Error on query failure."""
+    params = (user_id,) * len(USER_SNAPSHOT_QUERIES) + (user_id, user_id)
+    dtypes = {'investments_df': INVESTMENT_DTYPES, 'transactions_df': TRANSACTION_DTYPES,
+              'portfolio_investments_df': INVESTMENT_DTYPES}
+    with db_cursor() as (connection, cursor):
+        if connection is None:
+            return None
+
+        try:
+            data = {}
+            keys = [key for key, _ in USER_SNAPSHOT_QUERIES] + ['portfolio_summary']
+            for key, result in zip(keys, _execute_multi(cursor, SQL_GET_USER_SNAPSHOT, params)):
+                rows = result.fetchall()
+                if key == 'portfolio_summary':
+                    data[key] = _build_portfolio_summary([dict(zip(result.column_names, row)) for row in rows])
+                else:
+                    data[key] = _apply_dtypes(pd.DataFrame.from_records(rows, columns=result.column_names), dtypes.get(key))
+            return data
+        except Error as e:
+            logger.error("Error fetching data snapshot for user %s: %s", user_id, e)
+            raise e
+
+# Display-only numeric and date columns, typed once when the frame is built so Decimal
+# values don't linger as object dtype. Money used in purchase math stays Decimal.
+# Low-cardinality labels repeated on every row are stored as category.
+INVESTMENT_DTYPES = {'quantity': 'float64', 'current_unit_price': 'float64', 'current_value': 'float64', 'purchase_date': 'datetime64[ns]',
+                     'portfolio_name': 'category', 'asset_category_name': 'category', 'asset_name': 'category',
+                     'unit_type': 'category', 'currency': 'category'}
+TRANSACTION_DTYPES = {'amount': 'float64', 'quantity': 'float64', 'unit_price_at_transaction': 'float64', 'transaction_date': 'datetime64[ns]',
+                      'transaction_type': 'category', 'asset_name': 'category', 'account_name': 'category'}
+ADMIN_ACCOUNT_DTYPES = {'current_balance': 'float64', 'created_at': 'datetime64[ns]'}
+
+def _rows_to_df(rows, dtypes=None):
+    """Converts fetched rows (a list or a row stream) to a DataFrame with DataFrame.from_records,
+    applying `dtypes` to whichever of its columns were selected.
+    Returns an empty DataFrame for no rows."""
+    if rows is None:
+        return pd.DataFrame()
+    return _apply_dtypes(pd.DataFrame.from_records(rows), dtypes)
+
+def _apply_dtypes(df, dtypes):
+    """Casts whichever of the `dtypes` columns the frame has, in one astype() call."""
+    if dtypes and not df.empty:
+        df = df.astype({column: dtype for column, dtype in dtypes.items() if column in df.columns})
+    return df
 
 if __name__ == '__main__':
     # --- Example Usage (for testing the database_manager) ---
+    logger.setLevel(logging.DEBUG) # Show the per-operation debug records while testing
+    # Whole frames (and their row dicts) only with WMS_DEBUG set; otherwise print the shape and first rows,
+    # so formatting cost doesn't grow with the tables
+    full_frames = bool(os.getenv('WMS_DEBUG'))
+    pd.options.display.max_rows = 20
+
+    def show(df):
+        print(df if full_frames else f"{df.shape}\n{df.head()}")
+
     print("--- Testing Database Manager ---")
 
     # 1. Test Connection
@@ -530,7 +1400,7 @@ if __name__ == '__main__':
             print("User 'test_user_new' already exists.")
             user_data = get_user_by_username('test_user_new')
             if user_data:
-                user_id = user_data[0]['user_id']
+                user_id = user_data['user_id']
             else:
                 user_id = None
 
@@ -541,7 +1411,7 @@ if __name__ == '__main__':
             print("Admin user 'admin_user' already exists.")
             admin_data = get_user_by_username('admin_user')
             if admin_data:
-                admin_id = admin_data[0]['user_id']
+                admin_id = admin_data['user_id']
             else:
                 admin_id = None
 
@@ -560,21 +1430,25 @@ if __name__ == '__main__':
         print(f"User role: {get_user_role(user_id)}")
 
         if admin_id:
-            print(f"Admin role: {get_user_role(admin_id)}")
+            print(f"Admin ({get_username(admin_id)}) role: {get_user_role(admin_id)}")
+            # The four admin views are independent reads, so they overlap on the dashboard pool
+            all_users, all_accounts, all_investments, all_transactions = run_concurrently([
+                (get_all_users,), (get_all_accounts,), (get_all_investments_detailed,), (get_all_transactions_detailed,)
+            ])
             print("\nAll Users (Admin View):")
-            print(pd.DataFrame(get_all_users()))
+            show(pd.DataFrame(all_users))
             print("\nAll Accounts (Admin View):")
-            print(pd.DataFrame(get_all_accounts()))
+            show(pd.DataFrame(all_accounts))
             print("\nAll Investments (Admin View):")
-            print(pd.DataFrame(get_all_investments_detailed()))
+            show(pd.DataFrame(all_investments))
             print("\nAll Transactions (Admin View):")
-            print(pd.DataFrame(get_all_transactions_detailed()))
+            show(pd.DataFrame(all_transactions))
 
 
         # 4. Add an asset type (if not exists)
-        asset_types = get_asset_types()
-        stock_type_id = None
-        if not any(at['type_name'] == 'Stock' for at in asset_types):
+        asset_type_ids = get_asset_types_by_names(['Stock', 'Crypto'])
+        stock_type_id = asset_type_ids.get('Stock')
+        if stock_type_id is None:
             try:
                 stock_type_id = add_asset_type('Stock', 'Publicly traded company shares')
                 print(f"Added new asset type 'Stock' with ID: {stock_type_id}")
@@ -583,10 +1457,9 @@ if __name__ == '__main__':
                 stock_type_id = None
         else:
             print("Asset type 'Stock' already exists.")
-            stock_type_id = [at['asset_type_id'] for at in asset_types if at['type_name'] == 'Stock'][0]
 
-        crypto_type_id = None
-        if not any(at['type_name'] == 'Crypto' for at in asset_types):
+        crypto_type_id = asset_type_ids.get('Crypto')
+        if crypto_type_id is None:
             try:
                 crypto_type_id = add_asset_type('Crypto', 'Cryptocurrency assets')
                 print(f"Added new asset type 'Crypto' with ID: {crypto_type_id}")
@@ -595,15 +1468,14 @@ if __name__ == '__main__':
                 crypto_type_id = None
         else:
             print("Asset type 'Crypto' already exists.")
-            crypto_type_id = [at['asset_type_id'] for at in asset_types if at['type_name'] == 'Crypto'][0]
 
 
         # 5. Add assets (if not exists)
-        assets = get_all_assets()
-        gold_asset_id = None
-        bitcoin_asset_id = None
+        asset_ids = get_assets_by_names(['Gold', 'Bitcoin'])
+        gold_asset_id = asset_ids.get('Gold')
+        bitcoin_asset_id = asset_ids.get('Bitcoin')
 
-        if not any(a['name'] == 'Gold' for a in assets):
+        if gold_asset_id is None:
             try:
                 gold_asset_id = add_asset('Gold', Decimal('70.00'), 'grams')
                 print(f"Added new asset 'Gold' with ID: {gold_asset_id}")
@@ -612,9 +1484,8 @@ if __name__ == '__main__':
                 gold_asset_id = None
         else:
             print("Asset 'Gold' already exists.")
-            gold_asset_id = [a['asset_id'] for a in assets if a['name'] == 'Gold'][0]
 
-        if not any(a['name'] == 'Bitcoin' for a in assets):
+        if bitcoin_asset_id is None:
             try:
                 bitcoin_asset_id = add_asset('Bitcoin', Decimal('65000.00'), 'BTC')
                 print(f"Added new asset 'Bitcoin' with ID: {bitcoin_asset_id}")
@@ -623,15 +1494,13 @@ if __name__ == '__main__':
                 bitcoin_asset_id = None
         else:
             print("Asset 'Bitcoin' already exists.")
-            bitcoin_asset_id = [a['asset_id'] for a in assets if a['name'] == 'Bitcoin'][0]
 
         print("\nAll Assets:")
-        print(get_assets_df())
+        show(get_assets_df())
 
         # 6. Add a portfolio
-        portfolios = get_portfolios_by_user(user_id)
-        portfolio_id = None
-        if not any(p['portfolio_name'] == 'Test Portfolio' for p in portfolios):
+        portfolio_id = get_portfolios_by_names(user_id, ['Test Portfolio']).get('Test Portfolio')
+        if portfolio_id is None:
             try:
                 portfolio_id = add_portfolio(user_id, 'Test Portfolio', 'A portfolio for testing investments')
                 print(f"Added new portfolio with ID: {portfolio_id}")
@@ -640,7 +1509,6 @@ if __name__ == '__main__':
                 portfolio_id = None
         else:
             print("Portfolio 'Test Portfolio' already exists.")
-            portfolio_id = [p['portfolio_id'] for p in portfolios if p['portfolio_name'] == 'Test Portfolio'][0]
 
         # 7. Add an account
         accounts = get_accounts_by_user(user_id)
@@ -675,28 +1543,30 @@ if __name__ == '__main__':
             print("Cannot add gold investment: Portfolio, Asset Category, or Asset ID is missing.")
 
         # 9. Get investments (should show dynamically calculated current_value)
-        investments = get_investments_by_user(user_id)
-        print(f"\nUser's investments (with dynamic current_value): {investments}")
+        # One query serves both views of the same rows
+        investments_df = get_investments_df(user_id)
+        if full_frames:
+            print(f"\nUser's investments (with dynamic current_value): {investments_df.to_dict('records')}")
         print("\nInvestments DataFrame (User View):")
-        print(get_investments_df(user_id))
+        show(investments_df)
 
         # 10. Update asset price (simulating admin action)
         if gold_asset_id:
-            print(f"\nUpdating Gold price from {get_asset_by_id(gold_asset_id)['unit_price']} to 75.00...")
+            print(f"\nUpdating Gold price from {get_asset_price(gold_asset_id)} to 75.00...")
             if update_asset_price(gold_asset_id, Decimal('75.00')):
                 print("Gold price updated successfully.")
-                print(f"New Gold price: {get_asset_by_id(gold_asset_id)['unit_price']}")
+                print(f"New Gold price: {get_asset_price(gold_asset_id)}")
                 # Re-fetch investments to see the effect of price change
                 investments_after_price_update = get_investments_df(user_id)
                 print("\nInvestments DataFrame (User View) AFTER Gold Price Update:")
-                print(investments_after_price_update)
+                show(investments_after_price_update)
             else:
                 print("Failed to update Gold price.")
 
         # 11. Add a transaction (e.g., buying more Gold)
         if account_id is not None and gold_asset_id is not None and gold_investment_id is not None:
             buy_quantity = Decimal('5.0')
-            current_gold_price = get_asset_by_id(gold_asset_id)['unit_price']
+            current_gold_price = get_asset_price(gold_asset_id)
             total_buy_cost = buy_quantity * current_gold_price
             print(f"\nBuying {buy_quantity} grams of Gold at ${current_gold_price}/gram for total ${total_buy_cost}...")
 
@@ -723,51 +1593,34 @@ if __name__ == '__main__':
             transaction_id = None
 
         # 12. Get transactions
-        transactions = get_transactions_by_user(user_id)
-        print(f"\nUser's transactions: {transactions}")
+        transactions_df = get_transactions_df(user_id)
+        if full_frames:
+            print(f"\nUser's transactions: {transactions_df.to_dict('records')}")
         print("\nTransactions DataFrame (User View):")
-        print(get_transactions_df(user_id))
-
+        show(transactions_df)
 
-        # 13. Get Portfolio Summary
-        portfolio_summary = get_portfolio_summary(user_id)
-        print(f"\nPortfolio Summary (with dynamic investment value): {portfolio_summary}")
 
-        # 14. Get DataFrames
-        accounts_df = get_account_balances_df(user_id)
+        # 13-14. Get the Portfolio Summary and every DataFrame in a single round trip
+        snapshot = get_all_user_dataframes(user_id) or {}
+        print(f"\nPortfolio Summary (with dynamic investment value): {snapshot.get('portfolio_summary')}")
+        print(f"Value per portfolio: {get_portfolio_values(user_id)}")
+        accounts_df, investments_df, transactions_df, portfolio_investments_df = (
+            snapshot.get(key, pd.DataFrame()) for key, _ in USER_SNAPSHOT_QUERIES
+        )
         print("\nAccounts DataFrame:")
-        print(accounts_df)
-
-        investments_df = get_investments_df(user_id)
+        show(accounts_df)
         print("\nInvestments DataFrame:")
-        print(investments_df)
-
-        transactions_df = get_transactions_df(user_id)
+        show(investments_df)
         print("\nTransactions DataFrame:")
-        print(transactions_df)
-
-        portfolios_df = get_portfolios_df(user_id)
-        print("\nPortfolios DataFrame:")
-        print(portfolios_df)
-
-        asset_types_df = get_asset_types_df()
-        print("\nAsset Types DataFrame:")
-        print(asset_types_df)
-
-        assets_df = get_assets_df()
-        print("\nAssets DataFrame:")
-        print(assets_df)
+        show(transactions_df)
+        print("\nPortfolios with their investments, assets and asset types:")
+        show(portfolio_investments_df)
 
         # Clean up (optional, uncomment to delete test data)
         # print("\n--- Cleaning up test data ---\n")
-        # if transaction_id: delete_transaction(transaction_id)
-        # if gold_investment_id: delete_investment(gold_investment_id)
-        # if account_id: delete_account(account_id)
-        # if portfolio_id: delete_portfolio(portfolio_id)
-        # if gold_asset_id: execute_query("DELETE FROM assets WHERE asset_id = %s", (gold_asset_id,))
-        # if bitcoin_asset_id: execute_query("DELETE FROM assets WHERE asset_id = %s", (bitcoin_asset_id,))
-        # if stock_type_id: execute_query("DELETE FROM asset_types WHERE asset_type_id = %s", (stock_type_id,))
-        # if crypto_type_id: execute_query("DELETE FROM asset_types WHERE asset_type_id = %s", (crypto_type_id,))
-        # if user_id: delete_user_and_all_data(user_id) # Use the new comprehensive delete function
-        # if admin_id: delete_user_and_all_data(admin_id) # Use the new comprehensive delete function
+        # # Both users with their transactions, investments, accounts and portfolios: one transaction, one round trip
+        # delete_users_and_all_data([user_id, admin_id])
+        # # The assets are no longer referenced once the users' investments and transactions are gone
+        # delete_by_ids('assets', 'asset_id', [gold_asset_id, bitcoin_asset_id]) # One DELETE ... IN per table
+        # delete_by_ids('asset_types', 'asset_type_id', [stock_type_id, crypto_type_id])
         # print("Test data cleaned up.")